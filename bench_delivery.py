@@ -0,0 +1,163 @@
+"""Замер доставки уведомлений и обработки апдейтов на фейковом Bot API.
+
+Сценарий burst: в SendScheduler разом попадают ``chats * per-chat``
+уведомлений, отрендеренных так же, как в send_project_notification, а
+FakeTelegramServer отвечает с заданной задержкой, лимитом на чат и долей
+429. Считаются сообщения в секунду и задержка от постановки в очередь до
+ответа API. Сценарий polling прогоняет ``--updates`` апдейтов через
+getUpdates и обработчик aiogram, который отвечает в чат.
+
+    python bench_delivery.py --chats 50 --per-chat 10 --latency 0.05
+    python bench_delivery.py --chats 20 --per-chat 5 --retry-rate 0.05 --updates 2000
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from aiogram import Dispatcher, types
+
+from fake_telegram import FakeTelegramServer
+from notifications import DEFAULT_TEMPLATE, NotificationRenderer
+from sender import PRIORITY_ALERT, SendScheduler
+
+
+def make_project(number: int) -> dict:
+    return {
+        "id": str(number),
+        "title": f"Проект #{number}: разработка Telegram-бота",
+        "description": "Нужен бот для уведомлений о заказах " * 3,
+        "price": "5000 руб.",
+        "username": "buyer",
+        "time_left": "2 дня",
+        "url": f"https://kwork.ru/projects/view/{number}",
+    }
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+async def bench_burst(server: FakeTelegramServer, args):
+    bot = server.make_bot()
+    sender = SendScheduler(
+        bot,
+        global_rate=args.global_rate,
+        chat_interval=args.chat_interval,
+        group_interval=args.chat_interval * 3,
+        max_concurrency=args.concurrency,
+        max_retries=args.max_retries,
+    )
+    renderer = NotificationRenderer()
+    sender.start()
+
+    latencies = []
+    failed = 0
+
+    async def notify(chat_id: int, project: dict):
+        nonlocal failed
+        started = time.perf_counter()
+        message = renderer.render(project, DEFAULT_TEMPLATE)
+        try:
+            await sender.send(
+                chat_id, message, PRIORITY_ALERT, disable_web_page_preview=False
+            )
+        except Exception:
+            failed += 1
+            return
+        latencies.append(time.perf_counter() - started)
+
+    jobs = [
+        notify(1000 + chat, make_project(chat * args.per_chat + n))
+        for chat in range(args.chats)
+        for n in range(args.per_chat)
+    ]
+
+    started = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - started
+
+    await sender.stop()
+    await bot.session.close()
+
+    print(f"[burst] Доставлено: {len(latencies)}/{len(jobs)}, ошибок: {failed}")
+    print(f"[burst] Ответов 429 от API: {server.rejected}")
+    print(f"[burst] Время: {elapsed:.2f} сек, {len(latencies) / elapsed:.1f} сообщ/сек")
+    if latencies:
+        print(
+            "[burst] Задержка p50/p95/p99: "
+            f"{percentile(latencies, 0.5):.2f} / {percentile(latencies, 0.95):.2f} / "
+            f"{percentile(latencies, 0.99):.2f} сек"
+        )
+
+
+async def bench_polling(server: FakeTelegramServer, args):
+    bot = server.make_bot()
+    dp = Dispatcher()
+    handled = 0
+    done = asyncio.Event()
+
+    @dp.message()
+    async def reply(message: types.Message):
+        nonlocal handled
+        await message.answer("ok")
+        handled += 1
+        if handled >= args.updates:
+            done.set()
+
+    for update in range(args.updates):
+        server.inject_message(2000 + update % 100, "/help")
+
+    started = time.perf_counter()
+    polling = asyncio.create_task(
+        dp.start_polling(bot, polling_timeout=1, handle_signals=False)
+    )
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    await dp.stop_polling()
+    await polling
+    await bot.session.close()
+
+    print(f"[polling] Апдейтов обработано: {handled}/{args.updates}")
+    print(f"[polling] Время: {elapsed:.2f} сек, {handled / elapsed:.0f} апдейтов/сек")
+
+
+async def run(args):
+    server = FakeTelegramServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        chat_interval=args.api_chat_interval,
+        group_interval=args.api_chat_interval * 3,
+        retry_rate=args.retry_rate,
+        retry_after=args.retry_after,
+    )
+    await server.start(port=args.port)
+    try:
+        await bench_burst(server, args)
+        if args.updates:
+            server.chat_interval = 0
+            server.retry_rate = 0
+            await bench_polling(server, args)
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--per-chat", type=int, default=10)
+    parser.add_argument("--global-rate", type=float, default=25)
+    parser.add_argument("--chat-interval", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--api-chat-interval", type=float, default=1.0)
+    parser.add_argument("--retry-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--updates", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8081)
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(parser.parse_args()))
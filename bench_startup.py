@@ -0,0 +1,79 @@
+"""Замер времени от запуска процесса бота до первого getUpdates.
+
+Поднимает FakeTelegramServer, запускает ``python bot.py`` с
+TELEGRAM_API_URL на него и засекает момент первого long polling запроса.
+Нужна доступная БД (как и для обычного запуска). Отдельно меряется время
+одного ``import bot``.
+
+    python bench_startup.py --runs 5
+    USE_UVLOOP=false python bench_startup.py --runs 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from fake_telegram import FakeTelegramServer
+
+
+async def time_to_first_poll(args) -> float:
+    server = FakeTelegramServer()
+    await server.start(port=args.port)
+    env = {
+        **os.environ,
+        "TELEGRAM_API_URL": server.url,
+        "BOT_TOKEN": os.environ.get("BOT_TOKEN", "123456:FAKE-TOKEN"),
+        "BOT_MODE": "polling",
+        "METRICS_PORT": "0",
+    }
+
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "bot.py",
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        first_poll = await server.wait_for_call("getUpdates", args.timeout)
+        return first_poll - started
+    finally:
+        process.terminate()
+        await process.wait()
+        await server.stop()
+
+
+def import_time() -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", "import bot"],
+        check=True,
+        env={**os.environ, "LOG_FILE": ""},
+    )
+    return time.perf_counter() - started
+
+
+async def run(args):
+    imports = [import_time() for _ in range(args.runs)]
+    print(f"import bot: медиана {statistics.median(imports):.2f} сек")
+
+    polls = []
+    for _ in range(args.runs):
+        polls.append(await time_to_first_poll(args))
+    print(
+        f"Первый getUpdates через: медиана {statistics.median(polls):.2f} сек, "
+        f"мин {min(polls):.2f}, макс {max(polls):.2f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--port", type=int, default=8082)
+    asyncio.run(run(parser.parse_args()))
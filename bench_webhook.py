@@ -0,0 +1,93 @@
+"""Локальный замер пропускной способности webhook-режима.
+
+Поднимает WebhookServer на localhost, шлёт в него синтетические апдейты с
+секретным токеном и считает, сколько апдейтов в секунду проходит путь
+HTTP -> проверка токена -> очередь -> обработчики aiogram.
+
+    python bench_webhook.py --updates 5000 --concurrency 50 --workers 4
+"""
+
+import argparse
+import asyncio
+import time
+
+import aiohttp
+from aiogram import Bot, Dispatcher, types
+
+from webhook import SECRET_HEADER, WebhookServer
+
+SECRET = "bench-secret"
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 1000 + update_id % 50, "type": "private"},
+            "from": {
+                "id": 1000 + update_id % 50,
+                "is_bot": False,
+                "first_name": "Bench",
+            },
+            "text": "/help",
+        },
+    }
+
+
+async def run(args):
+    handled = 0
+
+    dp = Dispatcher()
+
+    @dp.message()
+    async def count_message(message: types.Message):
+        nonlocal handled
+        handled += 1
+
+    bot = Bot(token="123456:BENCHMARK-TOKEN")
+    server = WebhookServer(
+        dp,
+        bot,
+        path="/webhook",
+        secret=SECRET,
+        workers=args.workers,
+        queue_size=args.updates,
+    )
+    await server.start("127.0.0.1", args.port)
+
+    url = f"http://127.0.0.1:{args.port}/webhook"
+    headers = {SECRET_HEADER: SECRET}
+    queue: asyncio.Queue = asyncio.Queue()
+    for update_id in range(1, args.updates + 1):
+        queue.put_nowait(make_update(update_id))
+
+    async def client(session: aiohttp.ClientSession):
+        while not queue.empty():
+            payload = queue.get_nowait()
+            async with session.post(url, json=payload, headers=headers) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"webhook ответил {response.status}")
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(client(session) for _ in range(args.concurrency)))
+    await server.join()
+    elapsed = time.perf_counter() - started
+
+    await server.stop()
+    await bot.session.close()
+
+    print(f"Апдейтов обработано: {handled}/{args.updates}")
+    print(f"Время: {elapsed:.2f} сек")
+    print(f"Пропускная способность: {handled / elapsed:.0f} апдейтов/сек")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8089)
+    asyncio.run(run(parser.parse_args()))
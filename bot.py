@@ -1,40 +1,126 @@
 import asyncio
+import html
 import logging
+import os
+import shlex
+import tempfile
+import time
 from contextlib import suppress
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from aiogram import Bot, Dispatcher, F, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import FSInputFile
+from apscheduler.events import EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 
 from config import config
-from database import db
-from keyboards import get_admin_keyboard, get_main_keyboard, get_proxy_keyboard
-from models import ProcessedProject, User
+from database import OUTBOX_CHANNEL, db
+from export import FORMATS as EXPORT_FORMATS
+from export import export_projects
+from keyboards import (
+    get_admin_keyboard,
+    get_main_keyboard,
+    get_project_keyboard,
+    get_proxy_keyboard,
+    get_search_keyboard,
+)
+from leader import AdvisoryLeader, NotifyListener
+from log_setup import setup_logging
+from loopmon import LoopMonitor
+from matcher import SubscriptionMatcher, SubscriptionRule
+from metrics import (
+    PROJECTS_FOUND,
+    PROJECTS_NEW,
+    SCHEDULER_LAG_SECONDS,
+    SEND_QUEUE_DEPTH,
+    instrument_engine,
+    start_metrics_server,
+)
+from notifications import (
+    DEFAULT_TEMPLATE,
+    TEMPLATES,
+    NotificationRenderer,
+    build_digest_messages,
+    render_update,
+)
+from outbox import OutboxWorker
 from parser import KworkParser
+from perf import perf
 from proxy_manager import ProxyManager
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("logs/bot.log"), logging.StreamHandler()],
+from sender import PRIORITY_ALERT, PRIORITY_BULK, PRIORITY_NORMAL, SendScheduler
+from users import users
+from watchlist import WatchlistWorker
+from webhook import WebhookServer
+
+log_listener = setup_logging(
+    level=config.LOG_LEVEL,
+    fmt=config.LOG_FORMAT,
+    path=config.LOG_FILE,
+    rotation=config.LOG_ROTATION,
+    max_bytes=config.LOG_MAX_BYTES,
+    backup_count=config.LOG_BACKUP_COUNT,
+    when=config.LOG_ROTATE_WHEN,
 )
 logger = logging.getLogger(__name__)
 
-bot = Bot(token=config.BOT_TOKEN, parse_mode=ParseMode.HTML)
+bot = Bot(
+    token=config.BOT_TOKEN,
+    parse_mode=ParseMode.HTML,
+    session=(
+        AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+        if config.TELEGRAM_API_URL
+        else None
+    ),
+)
 dp = Dispatcher(storage=MemoryStorage())
+sender = SendScheduler(
+    bot,
+    global_rate=config.SEND_GLOBAL_RATE,
+    chat_interval=config.SEND_CHAT_INTERVAL,
+    group_interval=config.SEND_GROUP_INTERVAL,
+    max_concurrency=config.SEND_CONCURRENCY,
+    max_retries=config.SEND_MAX_RETRIES,
+)
 scheduler = AsyncIOScheduler()
+loop_monitor = LoopMonitor(config.LOOP_LAG_INTERVAL, config.LOOP_STALL_THRESHOLD)
+
+monitoring_chats: Dict[int, int] = {}  # chat_id -> check_interval (сек)
+next_check_at: Dict[int, float] = {}  # chat_id -> время следующей проверки (loop.time)
+MONITOR_JOB_ID = "monitor_tick"
+search_queries: Dict[int, str] = {}  # user_id -> последний поисковый запрос
+renderer = NotificationRenderer()
+SEND_QUEUE_DEPTH.set_function(lambda: sender.queue_size)
 
-monitoring_active: Dict[int, bool] = {}  # chat_id -> is_active
-monitoring_tasks: Dict[int, str] = {}  # chat_id -> task_id
 
-proxy_manager = None
-if config.PROXY_STRING:
+def observe_scheduler_lag(event):
+    if event.scheduled_run_times:
+        lag = datetime.now(event.scheduled_run_times[0].tzinfo) - min(
+            event.scheduled_run_times
+        )
+        SCHEDULER_LAG_SECONDS.labels(event.job_id).observe(lag.total_seconds())
+
+
+scheduler.add_listener(observe_scheduler_lag, EVENT_JOB_SUBMITTED)
+
+leader: Optional[AdvisoryLeader] = None  # создаётся в main для роли fetcher
+subscriptions = SubscriptionMatcher()
+proxy_manager: Optional[ProxyManager] = None  # создаётся в main через init_proxies
+
+
+def init_proxies():
+    global proxy_manager
+    if not config.PROXY_STRING:
+        logger.warning("⚠️ Прокси не настроены, используется прямое подключение")
+        return
+
     try:
         proxy_manager = ProxyManager(config.PROXY_STRING)
         logger.info(
@@ -43,15 +129,26 @@ if config.PROXY_STRING:
     except Exception as e:
         logger.error(f"❌ Ошибка инициализации менеджера прокси: {e}")
         proxy_manager = None
-else:
-    logger.warning("⚠️ Прокси не настроены, используется прямое подключение")
+
+
+async def warm_up_proxies():
+    try:
+        await proxy_manager.warm_up(config.PROXY_TEST_URL)
+    except Exception as e:
+        logger.error(f"❌ Ошибка прогрева прокси: {e}")
+
+
+@dp.update.outer_middleware()
+async def track_user_middleware(handler, event: types.Update, data: Dict[str, Any]):
+    users.touch(data.get("event_from_user"))
+    return await handler(event, data)
 
 
 async def init_database_with_retry(max_retries: int = 5, delay: int = 5) -> bool:
     for attempt in range(max_retries):
         try:
             logger.info(f"🚀 Попытка подключения к БД ({attempt + 1}/{max_retries})...")
-            db.init_db()
+            await asyncio.to_thread(db.init_db)
             logger.info("✅ База данных успешно инициализирована")
             return True
         except OperationalError as e:
@@ -70,14 +167,8 @@ async def init_database_with_retry(max_retries: int = 5, delay: int = 5) -> bool
 @dp.message(Command("start"))
 async def cmd_start(message: types.Message):
     try:
-        db.add_user(
-            user_id=message.from_user.id,
-            username=message.from_user.username,
-            first_name=message.from_user.first_name,
-            last_name=message.from_user.last_name,
-        )
-
-        is_admin = db.is_user_admin(message.from_user.id)
+        users.touch(message.from_user)
+        is_admin = await users.is_admin(message.from_user.id)
 
         welcome_text = """🚀 <b>Бот для мониторинга Kwork с поддержкой прокси</b>
 
@@ -88,6 +179,7 @@ async def cmd_start(message: types.Message):
 /stop - остановить мониторинг
 /check - проверить сейчас
 /status - статус мониторинга
+/search - поиск по архиву проектов
 /proxy - управление прокси
 /help - справка
 
@@ -109,7 +201,7 @@ async def cmd_start(message: types.Message):
 @dp.message(Command("proxy"))
 @dp.message(F.text == "🔄 Прокси")
 async def cmd_proxy(message: types.Message):
-    if message.from_user.id not in config.ADMIN_IDS:
+    if not await users.is_admin(message.from_user.id):
         await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
         return
 
@@ -156,7 +248,7 @@ async def cmd_proxy(message: types.Message):
 
 @dp.message(F.text == "🧪 Тест прокси")
 async def cmd_test_proxy(message: types.Message):
-    if message.from_user.id not in config.ADMIN_IDS:
+    if not await users.is_admin(message.from_user.id):
         await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
         return
 
@@ -217,30 +309,26 @@ async def cmd_test_proxy(message: types.Message):
 @dp.message(Command("monitor"))
 @dp.message(F.text == "▶️ Запустить мониторинг")
 async def cmd_monitor(message: types.Message):
-    if message.from_user.id not in config.ADMIN_IDS:
+    if not await users.is_admin(message.from_user.id):
         await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
         return
 
     chat_id = message.chat.id
 
-    if monitoring_active.get(chat_id):
+    parts = (message.text or "").split()
+    requested_interval = None
+    if len(parts) > 1 and parts[0].startswith("/monitor") and parts[1].isdigit():
+        requested_interval = max(int(parts[1]), config.MIN_CHECK_INTERVAL)
+
+    if chat_id in monitoring_chats and requested_interval is None:
         await message.answer("🔍 <b>Мониторинг уже запущен в этом чате!</b>")
         return
 
     try:
-        monitoring_active[chat_id] = True
-
-        task_id = f"monitor_{chat_id}"
-        scheduler.add_job(
-            check_new_projects,
-            "interval",
-            seconds=config.CHECK_INTERVAL,
-            args=[chat_id],
-            id=task_id,
-            replace_existing=True,
+        interval = await asyncio.to_thread(
+            db.set_monitoring, chat_id, True, requested_interval
         )
-
-        monitoring_tasks[chat_id] = task_id
+        schedule_chat(chat_id, interval, delay=interval)
 
         proxy_info = ""
         if proxy_manager:
@@ -249,7 +337,7 @@ async def cmd_monitor(message: types.Message):
 
         await message.answer(
             f"🔍 <b>Мониторинг запущен!</b>\n\n"
-            f"• Проверка каждые: {config.CHECK_INTERVAL} секунд\n"
+            f"• Проверка каждые: {interval} секунд\n"
             f"• Чат ID: {chat_id}"
             f"{proxy_info}\n\n"
             f"<i>Первая проверка...</i>",
@@ -268,23 +356,19 @@ async def cmd_monitor(message: types.Message):
 @dp.message(Command("stop"))
 @dp.message(F.text == "⏹️ Остановить мониторинг")
 async def cmd_stop(message: types.Message):
-    if message.from_user.id not in config.ADMIN_IDS:
+    if not await users.is_admin(message.from_user.id):
         await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
         return
 
     chat_id = message.chat.id
 
-    if not monitoring_active.get(chat_id):
+    if chat_id not in monitoring_chats:
         await message.answer("ℹ️ <b>Мониторинг не запущен в этом чате</b>")
         return
 
     try:
-        monitoring_active[chat_id] = False
-
-        task_id = monitoring_tasks.get(chat_id)
-        if task_id and scheduler.get_job(task_id):
-            scheduler.remove_job(task_id)
-            del monitoring_tasks[chat_id]
+        await asyncio.to_thread(db.set_monitoring, chat_id, False)
+        unschedule_chat(chat_id)
 
         await message.answer("🛑 <b>Мониторинг остановлен</b>")
         logger.info(f"⏹️ Мониторинг остановлен для чата {chat_id}")
@@ -297,7 +381,7 @@ async def cmd_stop(message: types.Message):
 @dp.message(Command("check"))
 @dp.message(F.text == "🔍 Проверить сейчас")
 async def cmd_check(message: types.Message):
-    if message.from_user.id not in config.ADMIN_IDS:
+    if not await users.is_admin(message.from_user.id):
         await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
         return
 
@@ -315,11 +399,11 @@ async def cmd_check(message: types.Message):
 @dp.message(F.text == "📊 Статус")
 async def cmd_status(message: types.Message):
     chat_id = message.chat.id
-    is_admin = message.from_user.id in config.ADMIN_IDS
+    is_admin = await users.is_admin(message.from_user.id)
 
     try:
-        with db.get_session() as session:
-            projects_count = session.query(ProcessedProject).count()
+        summary = await asyncio.to_thread(db.stats_summary)
+        latency = await asyncio.to_thread(db.latency_summary, chat_id)
 
         proxy_info = ""
         if proxy_manager and is_admin:
@@ -329,14 +413,38 @@ async def cmd_status(message: types.Message):
 
         status_text = f"""📊 <b>Статус мониторинга</b>
 
-• <b>Мониторинг:</b> {"🟢 Активен" if monitoring_active.get(chat_id) else "🔴 Остановлен"}
-• <b>Обработано проектов:</b> {projects_count}
+• <b>Мониторинг:</b> {"🟢 Активен" if chat_id in monitoring_chats else "🔴 Остановлен"}
+• <b>Обработано проектов:</b> {summary["processed"]}
 • <b>Администратор:</b> {"✅ Да" if is_admin else "❌ Нет"}
 • <b>ID чата:</b> <code>{chat_id}</code>{proxy_info}"""
 
+        median_price = summary["median_price"]
+        status_text += (
+            f"\n\n📈 <b>За 24 ч</b>\n"
+            f"• <b>Найдено новых:</b> {summary['new']} "
+            f"(~{summary['new_per_hour']:.1f} в час)\n"
+            f"• <b>Изменено:</b> {summary['updated']}\n"
+            f"• <b>Отправлено уведомлений:</b> {summary['notified']}\n"
+            f"• <b>Ошибок доставки:</b> {summary['failed']}\n"
+            f"• <b>Медианный бюджет:</b> "
+            f"{f'~{median_price:,.0f} руб.'.replace(',', ' ') if median_price else '—'}"
+        )
+        if summary["busiest_hour"]:
+            status_text += (
+                f"\n• <b>Пиковый час:</b> {summary['busiest_hour']:%H:00}"
+            )
+
+        status_text += "\n\n⏱️ <b>Задержка доставки за 24 ч</b> (p50 / p95 / p99):"
+        if latency["count"]:
+            status_text += f"\n• {format_latency(latency)}"
+            for row in latency["hourly"][:6]:
+                status_text += f"\n  {row['hour']:%H:00} — {format_latency(row)}"
+        else:
+            status_text += "\n• нет данных"
+
         if is_admin:
             status_text += (
-                f"\n• <b>Интервал проверки:</b> {config.CHECK_INTERVAL} секунд"
+                f"\n• <b>Интервал проверки:</b> {monitoring_chats.get(chat_id, config.CHECK_INTERVAL)} секунд"
             )
             status_text += (
                 f"\n• <b>ID пользователя:</b> <code>{message.from_user.id}</code>"
@@ -349,6 +457,16 @@ async def cmd_status(message: types.Message):
         await message.answer("❌ <b>Ошибка при получении статуса</b>")
 
 
+def format_latency(stats: Dict[str, Any]) -> str:
+    def fmt(seconds: float) -> str:
+        return f"{seconds / 60:.1f} мин" if seconds >= 120 else f"{seconds:.0f} с"
+
+    return (
+        f"{fmt(stats['p50'])} / {fmt(stats['p95'])} / {fmt(stats['p99'])} "
+        f"(n={stats['count']})"
+    )
+
+
 @dp.message(Command("help"))
 async def cmd_help(message: types.Message):
     help_text = """📚 <b>Справка по командам</b>
@@ -357,12 +475,20 @@ async def cmd_help(message: types.Message):
 /start - Запустить бота
 /help - Показать эту справку
 /status - Статус мониторинга
+/search &lt;запрос&gt; - Поиск по архиву проектов
+/watchlist - Отслеживаемые проекты
 
 <b>Команды для администраторов:</b>
-/monitor - Запустить мониторинг
+/monitor [сек] - Запустить мониторинг (опционально с интервалом)
 /stop - Остановить мониторинг
 /check - Проверить проекты сейчас
 /proxy - Управление прокси
+/template - Шаблон уведомлений (full, compact)
+/filter - Фильтр проектов по словам, цене и заказчикам
+/updates [on|off] - Алерты об изменении отправленных проектов
+/export [csv|jsonl] [дней] - Выгрузка архива проектов
+/perf [on|off|reset] - Тайминги этапов проверки
+/loop [on|off|reset] - Задержки event loop и блокирующие вызовы
 
 <b>Как работает бот:</b>
 1. Бот проверяет новые проекты на Kwork через ротацию прокси
@@ -381,13 +507,334 @@ async def cmd_help(message: types.Message):
     await message.answer(help_text)
 
 
+async def render_search_page(user_id: int, page: int):
+    query = search_queries.get(user_id)
+    if not query:
+        return "ℹ️ <b>Сначала отправьте /search &lt;запрос&gt;</b>", None
+
+    page_size = config.SEARCH_PAGE_SIZE
+    results, has_next = await asyncio.to_thread(
+        db.search_projects, query, page_size, page * page_size
+    )
+
+    if not results:
+        return f"🔎 По запросу <b>{html.escape(query)}</b> ничего не найдено", None
+
+    text = f"🔎 <b>Результаты по запросу «{html.escape(query)}»</b> (стр. {page + 1})\n"
+    for i, project in enumerate(results, page * page_size + 1):
+        text += (
+            f"\n{i}. <a href=\"{html.escape(project['url'] or '')}\">"
+            f"{html.escape(project['title'] or 'Без названия')}</a>"
+            f"\n   💰 {html.escape(project['price'] or '')}"
+            f" · 👤 {html.escape(project['username'] or '')}"
+        )
+
+    return text, get_search_keyboard(page, has_next)
+
+
+@dp.message(Command("search"))
+async def cmd_search(message: types.Message):
+    parts = (message.text or "").split(maxsplit=1)
+    if len(parts) < 2 or not parts[1].strip():
+        await message.answer("🔎 <b>Использование:</b> /search &lt;запрос&gt;")
+        return
+
+    search_queries[message.from_user.id] = parts[1].strip()[:200]
+
+    try:
+        text, keyboard = await render_search_page(message.from_user.id, 0)
+        await message.answer(
+            text, reply_markup=keyboard, disable_web_page_preview=True
+        )
+    except Exception as e:
+        logger.error(f"❌ Ошибка поиска: {e}")
+        await message.answer("❌ <b>Ошибка при поиске проектов</b>")
+
+
+@dp.callback_query(F.data.startswith("search:"))
+async def callback_search_page(callback: types.CallbackQuery):
+    try:
+        page = max(int(callback.data.split(":", 1)[1]), 0)
+        text, keyboard = await render_search_page(callback.from_user.id, page)
+        await callback.message.edit_text(
+            text, reply_markup=keyboard, disable_web_page_preview=True
+        )
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"❌ Ошибка переключения страницы поиска: {e}")
+        await callback.answer("❌ Ошибка поиска", show_alert=True)
+
+
+def parse_filter_args(args: str) -> SubscriptionRule:
+    """Разбирает «python "telegram бот" -wordpress price:1000-50000 !buyer»"""
+    include, exclude, blocked = set(), set(), set()
+    min_price = max_price = None
+
+    for token in shlex.split(args):
+        if token.startswith("price:"):
+            low, _, high = token[6:].partition("-")
+            min_price = float(low) if low else None
+            max_price = float(high) if high else None
+        elif token.startswith("-") and len(token) > 1:
+            exclude.add(token[1:].lower())
+        elif token.startswith("!") and len(token) > 1:
+            blocked.add(token[1:].lower())
+        else:
+            include.add(token.lstrip("+").lower())
+
+    include.discard("")
+    return SubscriptionRule(
+        include=frozenset(include),
+        exclude=frozenset(exclude),
+        min_price=min_price,
+        max_price=max_price,
+        blocked_users=frozenset(blocked),
+    )
+
+
+def describe_filter(rule: Optional[SubscriptionRule]) -> str:
+    if rule is None:
+        return "🧲 <b>Фильтр не задан:</b> приходят все проекты"
+
+    def words(values):
+        return ", ".join(html.escape(v) for v in sorted(values)) or "—"
+
+    low = f"{rule.min_price:.0f}" if rule.min_price is not None else "0"
+    high = f"{rule.max_price:.0f}" if rule.max_price is not None else "∞"
+    return (
+        "🧲 <b>Фильтр чата</b>\n\n"
+        f"• <b>Ключевые слова:</b> {words(rule.include)}\n"
+        f"• <b>Исключить:</b> {words(rule.exclude)}\n"
+        f"• <b>Цена:</b> {low} – {high} руб.\n"
+        f"• <b>Заблокированные заказчики:</b> {words(rule.blocked_users)}"
+    )
+
+
+@dp.message(Command("filter"))
+async def cmd_filter(message: types.Message):
+    if not await users.is_admin(message.from_user.id):
+        await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
+        return
+
+    chat_id = message.chat.id
+    parts = (message.text or "").split(maxsplit=1)
+    args = parts[1].strip() if len(parts) > 1 else ""
+
+    try:
+        if not args:
+            await message.answer(
+                describe_filter(subscriptions.get(chat_id))
+                + "\n\n<b>Использование:</b> /filter python \"telegram бот\" "
+                "-wordpress price:1000-50000 !заказчик\n/filter reset - сбросить"
+            )
+            return
+
+        if args == "reset":
+            await asyncio.to_thread(db.delete_subscription, chat_id)
+            subscriptions.remove(chat_id)
+            await message.answer("✅ <b>Фильтр сброшен</b>")
+            return
+
+        rule = parse_filter_args(args)
+        await asyncio.to_thread(db.save_subscription, chat_id, rule.to_dict())
+        subscriptions.update(chat_id, rule)
+        await message.answer("✅ " + describe_filter(rule))
+
+    except ValueError:
+        await message.answer("⚠️ <b>Не удалось разобрать фильтр</b>")
+    except Exception as e:
+        logger.error(f"❌ Ошибка настройки фильтра: {e}")
+        await message.answer("❌ <b>Ошибка при сохранении фильтра</b>")
+
+
+@dp.message(Command("template"))
+async def cmd_template(message: types.Message):
+    if not await users.is_admin(message.from_user.id):
+        await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
+        return
+
+    variants = ", ".join(TEMPLATES)
+    parts = (message.text or "").split()
+    if len(parts) < 2 or parts[1] not in TEMPLATES:
+        current = await asyncio.to_thread(db.get_chat_template, message.chat.id)
+        await message.answer(
+            f"🧩 <b>Шаблон уведомлений:</b> {current or DEFAULT_TEMPLATE}\n\n"
+            f"Использование: /template &lt;{variants}&gt;"
+        )
+        return
+
+    try:
+        await asyncio.to_thread(db.set_chat_template, message.chat.id, parts[1])
+        await message.answer(f"✅ <b>Шаблон уведомлений:</b> {parts[1]}")
+    except Exception as e:
+        logger.error(f"❌ Ошибка смены шаблона: {e}")
+        await message.answer("❌ <b>Ошибка при смене шаблона</b>")
+
+
+@dp.message(Command("updates"))
+async def cmd_updates(message: types.Message):
+    if not await users.is_admin(message.from_user.id):
+        await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
+        return
+
+    parts = (message.text or "").split()
+    action = parts[1] if len(parts) > 1 else ""
+    try:
+        if action in ("on", "off"):
+            await asyncio.to_thread(db.set_update_alerts, message.chat.id, action == "on")
+        enabled = await asyncio.to_thread(db.get_update_alerts, message.chat.id)
+    except Exception as e:
+        logger.error(f"❌ Ошибка настройки алертов об изменениях: {e}")
+        await message.answer("❌ <b>Ошибка при настройке алертов</b>")
+        return
+
+    await message.answer(
+        f"✏️ <b>Алерты об изменении проектов:</b> "
+        f"{'🟢 включены' if enabled else '🔴 выключены'}\n\n"
+        "Бот сообщит, если заказчик изменит бюджет, название, описание или "
+        "срок уже отправленного проекта.\n"
+        "Использование: /updates &lt;on|off&gt;"
+    )
+
+
+@dp.callback_query(F.data.startswith("watch:"))
+async def callback_watch(callback: types.CallbackQuery):
+    project_id = callback.data.split(":", 1)[1]
+    try:
+        added = await asyncio.to_thread(
+            db.toggle_watch, callback.message.chat.id, project_id
+        )
+    except Exception as e:
+        logger.error(f"❌ Ошибка отслеживания проекта {project_id}: {e}")
+        await callback.answer("❌ Ошибка, попробуйте позже")
+        return
+
+    if added is None:
+        await callback.answer("⚠️ Проект не найден в архиве")
+    elif added:
+        await callback.answer("👁 Проект добавлен в отслеживание")
+    else:
+        await callback.answer("🚫 Проект убран из отслеживания")
+
+
+@dp.message(Command("watchlist"))
+async def cmd_watchlist(message: types.Message):
+    try:
+        entries = await asyncio.to_thread(db.get_watchlist, message.chat.id)
+    except Exception as e:
+        logger.error(f"❌ Ошибка получения списка отслеживания: {e}")
+        await message.answer("❌ <b>Ошибка при получении списка отслеживания</b>")
+        return
+
+    if not entries:
+        await message.answer(
+            "👁 <b>Отслеживаемых проектов нет.</b>\n"
+            "Нажмите «Следить» под уведомлением о проекте."
+        )
+        return
+
+    text = f"👁 <b>Отслеживается проектов: {len(entries)}</b>\n"
+    for entry in entries:
+        details = [f"статус: {html.escape(entry['status'] or 'неизвестен')}"]
+        if entry["offers"] is not None:
+            details.append(f"предложений: {entry['offers']}")
+        if entry["expires_at"]:
+            details.append(f"до {entry['expires_at']:%d.%m %H:%M}")
+        text += (
+            f'\n• <a href="{html.escape(entry["url"])}">'
+            f"{html.escape(entry['title'] or entry['project_id'])}</a>\n"
+            f"  {', '.join(details)}"
+        )
+    await message.answer(text, disable_web_page_preview=True)
+
+
+async def notify_watch_change(
+    chat_id: int, entry: Dict[str, Any], state: Dict[str, Any]
+):
+    text = (
+        f"👁 <b>Изменился статус проекта</b>\n\n"
+        f"🏷️ <b>{html.escape(entry['title'] or entry['project_id'])}</b>\n"
+        f"🔄 <s>{html.escape(entry['status'] or '—')}</s> → "
+        f"<b>{html.escape(state['status'])}</b>"
+    )
+    offers = state.get("offers", entry["offers"])
+    if offers is not None:
+        text += f"\n📨 <b>Предложений:</b> {offers}"
+    text += f'\n\n🔗 <a href="{html.escape(entry["url"])}">Открыть проект</a>'
+    await sender.send(chat_id, text, PRIORITY_NORMAL, disable_web_page_preview=True)
+
+
+watchlist_worker = WatchlistWorker(
+    lambda: KworkParser(proxy_manager),
+    notify_watch_change,
+    concurrency=config.WATCH_CONCURRENCY,
+    batch_size=config.WATCH_BATCH_SIZE,
+    poll_interval=config.WATCH_POLL_INTERVAL,
+    min_interval=config.WATCH_MIN_INTERVAL,
+    max_interval=config.WATCH_MAX_INTERVAL,
+    time_fraction=config.WATCH_TIME_FRACTION,
+    max_age_days=config.WATCH_MAX_AGE_DAYS,
+)
+
+
+TELEGRAM_DOCUMENT_LIMIT = 50 * 1024 * 1024
+
+
+@dp.message(Command("export"))
+async def cmd_export(message: types.Message):
+    if not await users.is_admin(message.from_user.id):
+        await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
+        return
+
+    parts = (message.text or "").split()
+    fmt = parts[1] if len(parts) > 1 else "csv"
+    days = parts[2] if len(parts) > 2 else None
+    if fmt not in EXPORT_FORMATS or (days is not None and not days.isdigit()):
+        await message.answer(
+            "📤 <b>Использование:</b> /export [csv|jsonl] [дней]\n"
+            "Например: /export jsonl 30"
+        )
+        return
+
+    await message.answer("⏳ <b>Готовлю выгрузку архива...</b>")
+    filename = f"kwork_projects_{datetime.now():%Y%m%d_%H%M}.{fmt}.gz"
+
+    # Файл пишется на диск в отдельном потоке и отправляется оттуда же
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, filename)
+
+        def write() -> int:
+            with open(path, "wb") as fileobj:
+                return export_projects(fileobj, fmt, int(days) if days else None)
+
+        try:
+            exported = await asyncio.to_thread(write)
+        except Exception as e:
+            logger.error(f"❌ Ошибка выгрузки архива: {e}")
+            await message.answer("❌ <b>Ошибка при выгрузке архива</b>")
+            return
+
+        size = os.path.getsize(path)
+        if size > TELEGRAM_DOCUMENT_LIMIT:
+            await message.answer(
+                f"⚠️ <b>Выгрузка слишком большая ({size // 1024 // 1024} МБ).</b>\n"
+                "Уменьшите период или используйте <code>python export.py</code>"
+            )
+            return
+
+        await message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption=f"📤 Проектов в выгрузке: {exported}",
+        )
+
+
 @dp.callback_query(F.data == "monitor_start")
 async def callback_monitor_start(callback: types.CallbackQuery):
-    if callback.from_user.id not in config.ADMIN_IDS:
+    if not await users.is_admin(callback.from_user.id):
         await callback.answer("⛔ Доступно только админам", show_alert=True)
         return
 
-    if monitoring_active.get(callback.message.chat.id):
+    if callback.message.chat.id in monitoring_chats:
         await callback.answer("🔍 Мониторинг уже запущен!", show_alert=True)
         return
 
@@ -398,7 +845,7 @@ async def callback_monitor_start(callback: types.CallbackQuery):
 @dp.callback_query(F.data == "monitor_stop")
 async def callback_monitor_stop(callback: types.CallbackQuery):
     """Обработка остановки мониторинга через inline кнопку"""
-    if callback.from_user.id not in config.ADMIN_IDS:
+    if not await users.is_admin(callback.from_user.id):
         await callback.answer("⛔ Доступно только админам", show_alert=True)
         return
 
@@ -408,7 +855,7 @@ async def callback_monitor_stop(callback: types.CallbackQuery):
 
 @dp.callback_query(F.data == "check_now")
 async def callback_check_now(callback: types.CallbackQuery):
-    if callback.from_user.id not in config.ADMIN_IDS:
+    if not await users.is_admin(callback.from_user.id):
         await callback.answer("⛔ Доступно только админам", show_alert=True)
         return
 
@@ -422,82 +869,316 @@ async def callback_stats(callback: types.CallbackQuery):
     await callback.answer()
 
 
-async def send_project_notification(chat_id: int, project: Dict[str, Any]):
-    try:
-        message = f"""🎯 <b>НОВЫЙ ПРОЕКТ НА KWORK</b>
+async def send_project_notification(
+    chat_id: int, project: Dict[str, Any], template: str = DEFAULT_TEMPLATE
+):
+    message = renderer.render(project, template)
 
-🏷️ <b>{project["title"]}</b>
+    await sender.send(
+        chat_id,
+        message,
+        PRIORITY_ALERT,
+        reply_markup=get_project_keyboard(project["id"], project["url"]),
+        disable_web_page_preview=False,
+    )
 
-💰 <b>{project["price"]}</b>
-👤 <b>{project["username"]}</b>
-⏰ <b>{project["time_left"]}</b>
+    logger.debug("✅ Уведомление отправлено: %.50s...", project["title"])
 
-📝 {project["description"]}
 
-🔗 <a href="{project["url"]}">Открыть проект</a>"""
+async def deliver_outbox_entry(entry: Dict[str, Any]):
+    if entry["kind"] == "update":
+        await sender.send(
+            entry["chat_id"],
+            render_update(entry["payload"]),
+            PRIORITY_ALERT,
+            disable_web_page_preview=True,
+        )
+        return
+    await send_project_notification(
+        entry["chat_id"], entry["payload"], entry["template"] or DEFAULT_TEMPLATE
+    )
+
+
+async def deliver_digest(chat_id: int, entries: List[Dict[str, Any]]):
+    """Шлёт всплеск проектов компактным дайджестом вместо отдельных сообщений"""
+    projects = [entry["payload"] for entry in entries]
+    for indexes, text, keyboard in build_digest_messages(projects):
+        await sender.send(
+            chat_id,
+            text,
+            PRIORITY_ALERT,
+            reply_markup=keyboard,
+            disable_web_page_preview=True,
+        )
+        yield [entries[i] for i in indexes]
 
-        await bot.send_message(chat_id, message, disable_web_page_preview=False)
+    logger.info("📦 Дайджест из %d проектов отправлен в чат %s", len(entries), chat_id)
 
-        logger.info(f"✅ Уведомление отправлено: {project['title'][:50]}...")
-        return True
 
-    except Exception as e:
-        logger.error(f"❌ Ошибка отправки уведомления: {e}")
-        return False
+outbox_worker = OutboxWorker(
+    deliver_outbox_entry,
+    deliver_digest=deliver_digest,
+    digest_threshold=config.DIGEST_BURST_SIZE,
+    batch_size=config.OUTBOX_BATCH_SIZE,
+    lease_seconds=config.OUTBOX_LEASE_SECONDS,
+    poll_interval=config.OUTBOX_POLL_INTERVAL,
+    max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+)
+
+
+def schedule_chat(chat_id: int, interval: int, delay: float = 0):
+    monitoring_chats[chat_id] = interval
+    next_check_at[chat_id] = asyncio.get_running_loop().time() + delay
+
 
+def unschedule_chat(chat_id: int):
+    monitoring_chats.pop(chat_id, None)
+    next_check_at.pop(chat_id, None)
 
-async def check_new_projects(chat_id: int, manual: bool = False):
+
+async def restore_monitoring():
+    """Восстанавливает мониторинг из monitoring_settings со смещением старта"""
     try:
-        logger.info(
-            f"🔍 Проверка проектов для чата {chat_id} {'(ручная)' if manual else '(автоматическая)'}"
+        active = await asyncio.to_thread(db.get_active_monitoring)
+        subscriptions.load(
+            {
+                chat_id: SubscriptionRule.from_dict(rule)
+                for chat_id, rule in (
+                    await asyncio.to_thread(db.get_subscriptions)
+                ).items()
+            }
         )
+    except Exception as e:
+        logger.error(f"❌ Ошибка восстановления мониторинга: {e}")
+        return
 
-        parser = KworkParser(proxy_manager)
+    if not active:
+        return
 
-        async with parser as p:
-            all_projects = await p.get_projects()
+    window = min(
+        config.MONITOR_STAGGER_WINDOW, min(interval for _, interval in active)
+    )
+    step = window / len(active)
+    for i, (chat_id, interval) in enumerate(active):
+        schedule_chat(chat_id, interval, delay=i * step)
 
-        if not all_projects:
-            logger.warning("⚠️ Не удалось получить проекты с Kwork")
-            if manual:
-                await bot.send_message(
-                    chat_id, "⚠️ <b>Не удалось получить проекты с Kwork</b>"
-                )
-            return
+    logger.info(f"♻️ Восстановлен мониторинг для {len(active)} чатов")
+
+
+async def monitor_tick():
+    """Проверяет чаты, у которых подошёл их собственный интервал"""
+    now = asyncio.get_running_loop().time()
+    due = [chat_id for chat_id, at in next_check_at.items() if at <= now]
+    if not due:
+        return
+
+    for chat_id in due:
+        next_check_at[chat_id] = now + monitoring_chats[chat_id]
+
+    await check_new_projects(chat_ids=due)
+
+    try:
+        await asyncio.to_thread(db.touch_last_check, due)
+    except Exception as e:
+        logger.error(f"❌ Ошибка сохранения времени проверки: {e}")
+
+
+async def run_check(chat_id: Optional[int], manual: bool, chat_ids: List[int]):
+    logger.info(
+        "🔍 Проверка проектов для чатов %s %s",
+        chat_ids,
+        "(ручная)" if manual else "(автоматическая)",
+    )
+
+    # Автоматическая проверка укладывается в слот планировщика, ручную не режем
+    deadline = None
+    if not manual:
+        deadline = asyncio.get_running_loop().time() + config.CHECK_DEADLINE
+
+    parser = KworkParser(proxy_manager)
+
+    async with parser as p:
+        all_projects = await p.get_projects(deadline)
+
+    if not all_projects:
+        logger.warning("⚠️ Не удалось получить проекты с Kwork")
+        if manual:
+            await sender.send(
+                chat_id,
+                "⚠️ <b>Не удалось получить проекты с Kwork</b>",
+                PRIORITY_NORMAL,
+            )
+        return
 
-        logger.info(f"📊 Получено проектов с Kwork: {len(all_projects)}")
+    logger.info("📊 Получено проектов с Kwork: %d", len(all_projects))
+    PROJECTS_FOUND.inc(len(all_projects))
 
-        new_projects = []
-        for project in all_projects:
-            if not db.is_processed(project["id"]):
-                new_projects.append(project)
-                db.mark_processed(project["id"], project["title"], project["price"])
+    with perf.span("route"):
+        routes = subscriptions.route_many(all_projects, chat_ids)
+    with perf.span("dedup"):
+        deliveries, updates = await asyncio.to_thread(
+            db.claim_deliveries, all_projects, routes, config.PROJECT_UPDATE_ALERTS
+        )
+    PROJECTS_NEW.inc(len({pid for pids in deliveries.values() for pid in pids}))
 
-        db.cleanup_old_projects(config.MAX_PROCESSED_PROJECTS)
+    if manual and chat_id not in deliveries:
+        await sender.send(chat_id, "ℹ️ <b>Новых проектов нет</b>", PRIORITY_NORMAL)
+        logger.info("ℹ️ Новых проектов не найдено")
 
-        if new_projects:
-            logger.info(f"🎉 Найдено новых проектов: {len(new_projects)}")
+    for target_chat, project_ids in deliveries.items():
+        logger.info(
+            "🎉 Найдено новых проектов для чата %s: %d", target_chat, len(project_ids)
+        )
 
-            if manual:
-                await bot.send_message(
-                    chat_id, f"🎉 <b>Найдено новых проектов: {len(new_projects)}</b>"
-                )
+        if manual and target_chat == chat_id:
+            await sender.send(
+                chat_id,
+                f"🎉 <b>Найдено новых проектов: {len(project_ids)}</b>",
+                PRIORITY_NORMAL,
+            )
 
-            for i, project in enumerate(new_projects, 1):
-                success = await send_project_notification(chat_id, project)
-                if success and i < len(new_projects):  # Задержка между отправками
-                    await asyncio.sleep(1)
+    if updates:
+        logger.info(
+            "✏️ Алертов об изменении проектов: %d",
+            sum(len(project_ids) for project_ids in updates.values()),
+        )
 
-            logger.info(f"✅ Отправлено уведомлений: {len(new_projects)}")
+    # Уведомления уже лежат в outbox, воркер отправит их через sender
+    if deliveries or updates:
+        outbox_worker.kick()
 
-        elif manual:
-            await bot.send_message(chat_id, "ℹ️ <b>Новых проектов нет</b>")
-            logger.info("ℹ️ Новых проектов не найдено")
 
+async def check_new_projects(
+    chat_id: Optional[int] = None,
+    manual: bool = False,
+    chat_ids: Optional[List[int]] = None,
+):
+    """Один запрос к Kwork и fan-out новых проектов по переданным чатам.
+
+    При ручной проверке чат-инициатор добавляется к получателям, даже если
+    мониторинг в нём не запущен.
+    """
+    chat_ids = list(chat_ids or [])
+    if chat_id is not None and chat_id not in chat_ids:
+        chat_ids.append(chat_id)
+
+    if not chat_ids:
+        return
+
+    try:
+        with perf.trace("manual" if manual else "auto"):
+            await run_check(chat_id, manual, chat_ids)
     except Exception as e:
         logger.error(f"❌ Ошибка проверки проектов: {e}")
         if manual:
-            await bot.send_message(chat_id, "❌ <b>Ошибка при проверке проектов</b>")
+            await sender.send(
+                chat_id, "❌ <b>Ошибка при проверке проектов</b>", PRIORITY_NORMAL
+            )
+
+
+@dp.message(Command("perf"))
+async def cmd_perf(message: types.Message):
+    if not await users.is_admin(message.from_user.id):
+        await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
+        return
+
+    parts = (message.text or "").split()
+    action = parts[1] if len(parts) > 1 else ""
+    if action in ("on", "off"):
+        perf.enabled = action == "on"
+        await message.answer(
+            f"⏱️ <b>Замеры этапов {'включены' if perf.enabled else 'выключены'}</b>"
+        )
+        return
+    if action == "reset":
+        perf.reset()
+        await message.answer("⏱️ <b>Статистика замеров сброшена</b>")
+        return
+
+    stats = perf.stage_percentiles()
+    if not stats:
+        state = "включены" if perf.enabled else "выключены (/perf on)"
+        await message.answer(f"⏱️ <b>Нет данных.</b> Замеры {state}")
+        return
+
+    text = "⏱️ <b>Этапы проверки, мс (p50 / p95 / p99)</b>\n"
+    for stage, values in sorted(stats.items(), key=lambda item: -item[1]["p95"]):
+        text += (
+            f"\n<code>{stage:<14}</code> {values['p50'] * 1000:.0f} / "
+            f"{values['p95'] * 1000:.0f} / {values['p99'] * 1000:.0f} "
+            f"(n={values['count']})"
+        )
+
+    text += "\n\n🐢 <b>Самые медленные проверки:</b>"
+    for trace in perf.slowest(5):
+        breakdown = ", ".join(
+            f"{stage} {seconds * 1000:.0f}"
+            for stage, seconds in sorted(trace.stages.items(), key=lambda i: -i[1])
+        )
+        text += (
+            f"\n• {trace.started_at:%H:%M:%S} {trace.label}: "
+            f"{trace.total * 1000:.0f} мс ({breakdown})"
+        )
+
+    await message.answer(text)
+
+
+@dp.message(Command("loop"))
+async def cmd_loop(message: types.Message):
+    if not await users.is_admin(message.from_user.id):
+        await message.answer("⛔ <b>Эта команда доступна только администраторам</b>")
+        return
+
+    parts = (message.text or "").split()
+    action = parts[1] if len(parts) > 1 else ""
+    if action == "on":
+        loop_monitor.start()
+    elif action == "off":
+        await loop_monitor.stop()
+    elif action == "reset":
+        loop_monitor.reset()
+
+    text = (
+        f"🩺 <b>Монитор event loop:</b> "
+        f"{'🟢 включен' if loop_monitor.running else '🔴 выключен'}\n"
+        f"• <b>Порог блокировки:</b> {loop_monitor.threshold * 1000:.0f} мс\n"
+        f"• <b>Максимальная задержка:</b> {loop_monitor.max_lag * 1000:.0f} мс\n"
+        f"• <b>Блокировок:</b> {loop_monitor.stalls}"
+    )
+
+    offenders = loop_monitor.offenders()
+    if offenders:
+        text += "\n\n🐌 <b>Чаще всего блокируют:</b>"
+        for item in offenders:
+            text += (
+                f"\n• <code>{html.escape(item['where'])}</code>\n"
+                f"  {item['count']} раз, всего {item['total'] * 1000:.0f} мс, "
+                f"макс. {item['max'] * 1000:.0f} мс"
+            )
+
+    await message.answer(text)
+
+
+async def flush_users():
+    try:
+        await users.flush()
+    except Exception as e:
+        logger.error(f"❌ Ошибка сохранения профилей пользователей: {e}")
+
+
+async def run_retention():
+    try:
+        await asyncio.to_thread(
+            db.cleanup_old_projects,
+            config.RETENTION_POLICY,
+            config.MAX_PROCESSED_PROJECTS,
+            config.RETENTION_MAX_AGE_DAYS,
+        )
+        await asyncio.to_thread(db.cleanup_outbox, config.OUTBOX_RETENTION_DAYS)
+        await asyncio.to_thread(db.cleanup_latency, config.LATENCY_RETENTION_DAYS)
+        await asyncio.to_thread(db.cleanup_stats, config.STATS_RETENTION_DAYS)
+    except Exception as e:
+        logger.error(f"❌ Ошибка очистки старых проектов: {e}")
 
 
 @dp.message()
@@ -506,7 +1187,7 @@ async def handle_unknown_message(message: types.Message):
         await message.answer(
             "🤖 <b>Используйте команды или кнопки для управления ботом</b>\n\n"
             "Для списка команд отправьте /help",
-            reply_markup=get_main_keyboard(message.from_user.id in config.ADMIN_IDS),
+            reply_markup=get_main_keyboard(await users.is_admin(message.from_user.id)),
         )
 
 
@@ -515,18 +1196,82 @@ async def error_handler(event: types.ErrorEvent, **kwargs):
     logger.error(f"❌ Глобальная ошибка: {event.exception}")
     logger.error(f"Контекст ошибки: {event.update}")
 
-    if config.ADMIN_IDS:
-        admin_id = config.ADMIN_IDS[0]
+    if config.MAIN_ADMIN_ID:
+        admin_id = config.MAIN_ADMIN_ID
         try:
-            await bot.send_message(
+            await sender.send(
                 admin_id,
-                f"⚠️ <b>Произошла ошибка в боте:</b>\n\n<code>{str(event.exception)[:1000]}</code>",
+                f"⚠️ <b>Произошла ошибка в боте:</b>\n\n<code>{html.escape(str(event.exception)[:1000])}</code>",
+                PRIORITY_BULK,
             )
         except:
             pass
 
 
+async def run_updates():
+    """Получение апдейтов: long polling (по умолчанию) или webhook"""
+    if config.BOT_MODE != "webhook":
+        await bot.delete_webhook(drop_pending_updates=True)
+        await dp.start_polling(bot)
+        return
+
+    server = WebhookServer(
+        dp,
+        bot,
+        path=config.WEBHOOK_PATH,
+        secret=config.WEBHOOK_SECRET,
+        workers=config.WEBHOOK_WORKERS,
+    )
+    await server.start(config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    await bot.set_webhook(
+        f"{config.WEBHOOK_URL.rstrip('/')}{config.WEBHOOK_PATH}",
+        secret_token=config.WEBHOOK_SECRET,
+        drop_pending_updates=True,
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+async def run_notifier():
+    """Только разбор outbox: апдейты Telegram и проверки Kwork не нужны"""
+    listener = NotifyListener(db.engine, OUTBOX_CHANNEL, outbox_worker.kick)
+    try:
+        await listener.start()
+    except Exception as e:
+        logger.error(f"❌ LISTEN недоступен, работаем по опросу outbox: {e}")
+
+    logger.info("📨 Notifier запущен")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        listener.stop()
+
+
+async def run_as_leader(work):
+    """Выполняет work, пока процесс остаётся лидером"""
+    work_task = asyncio.create_task(work)
+    hold_task = asyncio.create_task(leader.hold())
+    done, _ = await asyncio.wait(
+        {work_task, hold_task}, return_when=asyncio.FIRST_COMPLETED
+    )
+
+    if hold_task in done:
+        logger.error("❌ Лидерство потеряно, останавливаем fetcher")
+        work_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await work_task
+    else:
+        hold_task.cancel()
+        await work_task
+
+
 async def main():
+    global leader
+    started = time.perf_counter()
+    metrics_runner = None
+    proxy_warmup = None
     try:
         logger.info("🚀 Запуск бота для мониторинга Kwork...")
 
@@ -534,19 +1279,81 @@ async def main():
             logger.error("❌ Токен бота не указан в переменных окружения")
             return
 
+        role = config.WORKER_ROLE
+        init_proxies()
+        if proxy_manager and config.PROXY_WARMUP and role != "notifier":
+            proxy_warmup = asyncio.create_task(warm_up_proxies())
+
+        # Подключение к БД, get_me и прогрев прокси идут параллельно
         logger.info("🔧 Инициализация базы данных...")
-        if not await init_database_with_retry():
+        db_ready, bot_info = await asyncio.gather(
+            init_database_with_retry(), bot.get_me()
+        )
+        if not db_ready:
             logger.error("❌ Критическая ошибка: не удалось подключиться к базе данных")
             return
+        instrument_engine(db.engine)
 
-        scheduler.start()
-        logger.info(f"📅 Планировщик запущен (интервал: {config.CHECK_INTERVAL} сек)")
+        logger.info(f"🤖 Бот: @{bot_info.username} (ID: {bot_info.id})")
+        if config.METRICS_PORT:
+            metrics_runner = await start_metrics_server(
+                config.METRICS_HOST, config.METRICS_PORT
+            )
 
-        await bot.delete_webhook(drop_pending_updates=True)
+        sender.start()
+        if config.LOOP_MONITOR_ENABLED:
+            loop_monitor.start()
+
+        if role in ("all", "notifier"):
+            outbox_worker.start()
+
+        if role == "notifier":
+            await run_notifier()
+            return
+
+        if role == "fetcher":
+            leader = AdvisoryLeader(
+                db.engine,
+                config.LEADER_LOCK_KEY,
+                retry_interval=config.LEADER_RETRY_INTERVAL,
+            )
+            await leader.acquire()
+
+        scheduler.add_job(
+            run_retention,
+            "interval",
+            seconds=config.RETENTION_INTERVAL,
+            id="retention",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1,
+            misfire_grace_time=None,
+        )
+        scheduler.add_job(
+            monitor_tick,
+            "interval",
+            seconds=config.MONITOR_TICK,
+            id=MONITOR_JOB_ID,
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1,
+        )
+        scheduler.add_job(
+            flush_users,
+            "interval",
+            seconds=config.USER_FLUSH_INTERVAL,
+            id="flush_users",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1,
+        )
+        await restore_monitoring()
+        watchlist_worker.start()
+
+        scheduler.start()
+        logger.info(f"📅 Планировщик запущен (тик: {config.MONITOR_TICK} сек)")
 
-        bot_info = await bot.get_me()
-        logger.info(f"🤖 Бот запущен: @{bot_info.username} (ID: {bot_info.id})")
-        logger.info(f"👑 Администраторы: {config.ADMIN_IDS}")
+        logger.info(f"👑 Администраторы: {config.ADMIN_IDS_ORDERED}")
 
         if proxy_manager:
             stats = proxy_manager.get_stats()
@@ -554,25 +1361,44 @@ async def main():
         else:
             logger.warning("⚠️ Работа без прокси")
 
-        logger.info("✅ Бот готов к работе. Ожидание сообщений...")
-        await dp.start_polling(bot)
+        logger.info(
+            "✅ Бот готов к работе за %.2f сек. Ожидание сообщений...",
+            time.perf_counter() - started,
+        )
+        if role == "fetcher":
+            await run_as_leader(run_updates())
+        else:
+            await run_updates()
 
     except Exception as e:
         logger.error(f"❌ Критическая ошибка при запуске бота: {e}")
     finally:
         logger.info("🛑 Завершение работы бота...")
-        scheduler.shutdown()
-
-        for task_id in list(monitoring_tasks.values()):
-            if scheduler.get_job(task_id):
-                scheduler.remove_job(task_id)
+        if scheduler.running:
+            scheduler.shutdown()
+        await flush_users()
+        await outbox_worker.stop()
+        await watchlist_worker.stop()
+        await sender.stop()
+        if proxy_warmup and not proxy_warmup.done():
+            proxy_warmup.cancel()
+        if leader:
+            await leader.release()
+        await loop_monitor.stop()
+        if metrics_runner:
+            await metrics_runner.cleanup()
 
         logger.info("👋 Бот остановлен")
+        log_listener.stop()
 
 
 if __name__ == "__main__":
-    import os
+    if config.USE_UVLOOP:
+        try:
+            import uvloop
 
-    os.makedirs("logs", exist_ok=True)
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            pass
 
     asyncio.run(main())
@@ -7,9 +7,57 @@ load_dotenv()
 
 class Config:
     BOT_TOKEN = os.getenv("BOT_TOKEN", "")
-    ADMIN_IDS = [
+    # Свой Bot API сервер (например, fake_telegram.py для нагрузочных тестов)
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+    ADMIN_IDS_ORDERED = [
         int(x.strip()) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip()
     ]
+    ADMIN_IDS = frozenset(ADMIN_IDS_ORDERED)
+    MAIN_ADMIN_ID = ADMIN_IDS_ORDERED[0] if ADMIN_IDS_ORDERED else None
+
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+    USER_FLUSH_INTERVAL = int(os.getenv("USER_FLUSH_INTERVAL", "10"))
+
+    # Режим получения апдейтов: "polling" или "webhook"
+    BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    # Обязателен в режиме webhook: A-Z, a-z, 0-9, _ и -, до 256 символов
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+
+    # Роль процесса: "all", "fetcher" (с выбором лидера) или "notifier"
+    WORKER_ROLE = os.getenv("WORKER_ROLE", "all").lower()
+    LEADER_LOCK_KEY = int(os.getenv("LEADER_LOCK_KEY", "7355608"))
+    LEADER_RETRY_INTERVAL = float(os.getenv("LEADER_RETRY_INTERVAL", "10"))
+
+    # Порт HTTP-эндпоинта /metrics (0 - выключен)
+    METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+    # Замеры этапов проверки для /perf
+    PERF_ENABLED = os.getenv("PERF_ENABLED", "false").lower() in ("1", "true", "yes")
+    PERF_WINDOW = int(os.getenv("PERF_WINDOW", "200"))
+
+    # Логи: уровень, формат ("text" или "json") и ротация файла ("size" или "time")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+    LOG_FILE = os.getenv("LOG_FILE", "logs/bot.log")
+    LOG_ROTATION = os.getenv("LOG_ROTATION", "size").lower()
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+
+    # Монитор задержек event loop (/loop)
+    LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+    LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.2"))
 
     DB_HOST = os.getenv("DB_HOST", "postgres")
     DB_PORT = os.getenv("DB_PORT", "5432")
@@ -18,12 +66,73 @@ class Config:
     DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
 
     CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", "600"))
+    MIN_CHECK_INTERVAL = int(os.getenv("MIN_CHECK_INTERVAL", "30"))
+    MONITOR_TICK = int(os.getenv("MONITOR_TICK", "15"))
+    MONITOR_STAGGER_WINDOW = int(os.getenv("MONITOR_STAGGER_WINDOW", "120"))
     MAX_PROCESSED_PROJECTS = int(os.getenv("MAX_PROCESSED_PROJECTS", "1000"))
 
+    # Политика хранения processed_projects: "count" или "age"
+    RETENTION_POLICY = os.getenv("RETENTION_POLICY", "count").lower()
+    if RETENTION_POLICY not in ("count", "age"):
+        raise ValueError(f"Неизвестная RETENTION_POLICY: {RETENTION_POLICY}")
+    RETENTION_MAX_AGE_DAYS = int(os.getenv("RETENTION_MAX_AGE_DAYS", "30"))
+    RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "3600"))
+
+    # Лимиты отправки: ~30 сообщений/сек глобально, 1/сек в чат, 20/мин в группу
+    SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "25"))
+    SEND_CHAT_INTERVAL = float(os.getenv("SEND_CHAT_INTERVAL", "1.0"))
+    SEND_GROUP_INTERVAL = float(os.getenv("SEND_GROUP_INTERVAL", "3.0"))
+    SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "16"))
+    SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "5"))
+
+    # Чатов за один проход outbox; записи чата арендуются все сразу
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+    OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+    OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+    LATENCY_RETENTION_DAYS = int(os.getenv("LATENCY_RETENTION_DAYS", "90"))
+    STATS_RETENTION_DAYS = int(os.getenv("STATS_RETENTION_DAYS", "365"))
+
+    # Начиная с этого числа новых проектов в чат они уходят дайджестом (0 - выкл.)
+    DIGEST_BURST_SIZE = int(os.getenv("DIGEST_BURST_SIZE", "5"))
+
+    # Отпечатки проектов и алерты "проект обновлён" (включаются в чате через /updates)
+    PROJECT_UPDATE_ALERTS = os.getenv("PROJECT_UPDATE_ALERTS", "true").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+    # Повторный опрос отслеживаемых проектов (кнопка «Следить»)
+    WATCH_CONCURRENCY = int(os.getenv("WATCH_CONCURRENCY", "4"))
+    WATCH_BATCH_SIZE = int(os.getenv("WATCH_BATCH_SIZE", "50"))
+    WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "30"))
+    WATCH_MIN_INTERVAL = float(os.getenv("WATCH_MIN_INTERVAL", "120"))
+    WATCH_MAX_INTERVAL = float(os.getenv("WATCH_MAX_INTERVAL", "3600"))
+    WATCH_TIME_FRACTION = float(os.getenv("WATCH_TIME_FRACTION", "0.1"))
+    WATCH_MAX_AGE_DAYS = int(os.getenv("WATCH_MAX_AGE_DAYS", "14"))
+
+    SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "5"))
+
     PROXY_STRING = os.getenv("PROXY_STRING", "")
     MAX_REQUESTS_PER_PROXY = int(os.getenv("MAX_REQUESTS_PER_PROXY", "6"))
     PROXY_TEST_URL = os.getenv("PROXY_TEST_URL", "https://api.ipify.org?format=json")
     PROXY_TIMEOUT = int(os.getenv("PROXY_TIMEOUT", "10"))
+    # Параллельная проверка всех прокси при старте
+    PROXY_WARMUP = os.getenv("PROXY_WARMUP", "true").lower() in ("1", "true", "yes")
+
+    # Общий бюджет повторов запросов к Kwork: доля от успешных за окно
+    RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+    RETRY_BUDGET_MIN = int(os.getenv("RETRY_BUDGET_MIN", "3"))
+    RETRY_BUDGET_WINDOW = float(os.getenv("RETRY_BUDGET_WINDOW", "60"))
+    RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+    RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+    # Автоматическая проверка не выходит за свой слот планировщика
+    CHECK_DEADLINE = float(os.getenv("CHECK_DEADLINE", str(MONITOR_TICK)))
+
+    # uvloop вместо стандартного event loop, если пакет установлен
+    USE_UVLOOP = os.getenv("USE_UVLOOP", "true").lower() in ("1", "true", "yes")
 
     @property
     def DATABASE_URL(self):
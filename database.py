@@ -1,43 +1,92 @@
 import logging
+import uuid
 from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.sql import func
 
 from config import config
-from models import Base, MonitoringSettings, ProcessedProject, User
+from fingerprint import diff, fingerprint
+from models import (
+    ArchivedProject,
+    Base,
+    MonitoringSettings,
+    NotificationOutbox,
+    ProcessedProject,
+    Subscription,
+    User,
+)
+from stats import approx_median, price_histogram
 
 logger = logging.getLogger(__name__)
 
+OUTBOX_CHANNEL = "kwork_outbox"
+
+# Колонки, добавленные в уже существующие таблицы (create_all их не создаёт)
+SCHEMA_UPGRADES = [
+    "ALTER TABLE monitoring_settings "
+    "ADD COLUMN IF NOT EXISTS template VARCHAR(20) DEFAULT 'full'",
+    "ALTER TABLE monitoring_settings "
+    "ADD COLUMN IF NOT EXISTS notify_updates BOOLEAN DEFAULT FALSE",
+    "ALTER TABLE processed_projects ADD COLUMN IF NOT EXISTS fingerprint BIGINT",
+    "ALTER TABLE project_archive ADD COLUMN IF NOT EXISTS expires_at TIMESTAMPTZ",
+    "ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS lease_token VARCHAR(32)",
+    "ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS template VARCHAR(20)",
+    # Однократная инициализация счётчика; при наличии строки count(*) не выполняется
+    "INSERT INTO stats_counters (name, value) "
+    "SELECT 'processed_projects', c.total FROM "
+    "(SELECT count(*) AS total FROM processed_projects) c "
+    "WHERE NOT EXISTS (SELECT 1 FROM stats_counters "
+    "WHERE name = 'processed_projects')",
+]
+
 
 class Database:
+    """Engine и фабрика сессий создаются при первом обращении, а не при
+    импорте: импорт бота не тянет драйвер БД и не тормозит старт.
+    """
+
     def __init__(self):
+        self.database_url = f"postgresql://{config.DB_USER}:{config.DB_PASSWORD}@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}"
+
+    @cached_property
+    def engine(self) -> Engine:
         try:
             logger.info(
                 f"Подключение к базе данных: {config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}"
             )
-            database_url = f"postgresql://{config.DB_USER}:{config.DB_PASSWORD}@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}"
             logger.info(
-                f"URL подключения: {database_url.replace(config.DB_PASSWORD, '***')}"
+                f"URL подключения: {self.database_url.replace(config.DB_PASSWORD, '***')}"
             )
-
-            self.engine = create_engine(
-                database_url, pool_pre_ping=True, pool_recycle=3600, echo=False
+            return create_engine(
+                self.database_url, pool_pre_ping=True, pool_recycle=3600, echo=False
             )
-            self.SessionLocal = sessionmaker(
-                autocommit=False, autoflush=False, bind=self.engine
-            )
-            self.Session = scoped_session(self.SessionLocal)
-
         except Exception as e:
             logger.error(f"Ошибка при создании подключения к БД: {e}")
             raise
 
+    @cached_property
+    def Session(self) -> scoped_session:
+        return scoped_session(
+            sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        )
+
     def init_db(self):
         try:
             logger.info("Создание таблиц в базе данных...")
+            with self.engine.begin() as connection:
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
             Base.metadata.create_all(bind=self.engine)
+            with self.engine.begin() as connection:
+                for statement in SCHEMA_UPGRADES:
+                    connection.execute(text(statement))
             logger.info("✅ Таблицы успешно созданы")
         except SQLAlchemyError as e:
             logger.error(f"❌ Ошибка создания таблиц: {e}")
@@ -84,6 +133,30 @@ class Database:
                 )
                 session.add(user)
 
+    def upsert_users(self, profiles: List[Dict[str, Any]]):
+        """Пакетный upsert профилей одним запросом"""
+        if not profiles:
+            return
+
+        statement = insert(User).values(
+            [
+                {**profile, "is_admin": profile["user_id"] in config.ADMIN_IDS}
+                for profile in profiles
+            ]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "username": statement.excluded.username,
+                "first_name": statement.excluded.first_name,
+                "last_name": statement.excluded.last_name,
+                "is_admin": statement.excluded.is_admin,
+                "is_active": True,
+            },
+        )
+        with self.get_session() as session:
+            session.execute(statement)
+
     def is_user_admin(self, user_id: int) -> bool:
         with self.get_session() as session:
             user = session.query(User).filter_by(user_id=user_id).first()
@@ -107,20 +180,855 @@ class Database:
                 )
                 session.add(project)
 
-    def cleanup_old_projects(self, max_count: int = 1000):
+    def set_monitoring(
+        self, chat_id: int, is_active: bool, check_interval: Optional[int] = None
+    ) -> int:
+        """Сохраняет состояние мониторинга чата и возвращает его интервал"""
+        updates = {"is_active": is_active}
+        if check_interval is not None:
+            updates["check_interval"] = check_interval
+
+        statement = (
+            insert(MonitoringSettings)
+            .values(
+                chat_id=chat_id,
+                is_active=is_active,
+                check_interval=check_interval or config.CHECK_INTERVAL,
+            )
+            .on_conflict_do_update(index_elements=["chat_id"], set_=updates)
+            .returning(MonitoringSettings.check_interval)
+        )
+
         with self.get_session() as session:
-            count = session.query(ProcessedProject).count()
-            if count > max_count:
-                to_delete = count - max_count
-                oldest = (
-                    session.query(ProcessedProject)
-                    .order_by(ProcessedProject.created_at)
-                    .limit(to_delete)
-                    .all()
+            return session.execute(statement).scalar_one()
+
+    def get_active_monitoring(self) -> List[Tuple[int, int]]:
+        with self.get_session() as session:
+            rows = (
+                session.query(
+                    MonitoringSettings.chat_id, MonitoringSettings.check_interval
                 )
-                for project in oldest:
-                    session.delete(project)
-                logger.info(f"Очищено {len(oldest)} старых проектов")
+                .filter(MonitoringSettings.is_active.is_(True))
+                .order_by(MonitoringSettings.chat_id)
+                .all()
+            )
+            return [(chat_id, interval) for chat_id, interval in rows]
+
+    def set_chat_template(self, chat_id: int, template: str):
+        statement = (
+            insert(MonitoringSettings)
+            .values(
+                chat_id=chat_id,
+                is_active=False,
+                check_interval=config.CHECK_INTERVAL,
+                template=template,
+            )
+            .on_conflict_do_update(
+                index_elements=["chat_id"], set_={"template": template}
+            )
+        )
+        with self.get_session() as session:
+            session.execute(statement)
+
+    def set_update_alerts(self, chat_id: int, enabled: bool):
+        statement = (
+            insert(MonitoringSettings)
+            .values(
+                chat_id=chat_id,
+                is_active=False,
+                check_interval=config.CHECK_INTERVAL,
+                notify_updates=enabled,
+            )
+            .on_conflict_do_update(
+                index_elements=["chat_id"], set_={"notify_updates": enabled}
+            )
+        )
+        with self.get_session() as session:
+            session.execute(statement)
+
+    def get_update_alerts(self, chat_id: int) -> bool:
+        with self.get_session() as session:
+            enabled = (
+                session.query(MonitoringSettings.notify_updates)
+                .filter(MonitoringSettings.chat_id == chat_id)
+                .scalar()
+            )
+            return bool(enabled)
+
+    def get_chat_template(self, chat_id: int) -> Optional[str]:
+        with self.get_session() as session:
+            return (
+                session.query(MonitoringSettings.template)
+                .filter(MonitoringSettings.chat_id == chat_id)
+                .scalar()
+            )
+
+    def touch_last_check(self, chat_ids: List[int]):
+        if not chat_ids:
+            return
+        with self.get_session() as session:
+            session.execute(
+                text(
+                    "UPDATE monitoring_settings SET last_check = now() "
+                    "WHERE chat_id = ANY(CAST(:chat_ids AS BIGINT[]))"
+                ),
+                {"chat_ids": list(chat_ids)},
+            )
+
+    def get_subscriptions(self) -> Dict[int, Dict[str, Any]]:
+        with self.get_session() as session:
+            return {
+                sub.chat_id: {
+                    "include_keywords": sub.include_keywords,
+                    "exclude_keywords": sub.exclude_keywords,
+                    "min_price": sub.min_price,
+                    "max_price": sub.max_price,
+                    "blocked_users": sub.blocked_users,
+                }
+                for sub in session.query(Subscription).all()
+            }
+
+    def save_subscription(self, chat_id: int, rule: Dict[str, Any]):
+        statement = insert(Subscription).values(chat_id=chat_id, **rule)
+        statement = statement.on_conflict_do_update(
+            index_elements=["chat_id"], set_={**rule, "updated_at": func.now()}
+        )
+        with self.get_session() as session:
+            session.execute(statement)
+
+    def delete_subscription(self, chat_id: int):
+        with self.get_session() as session:
+            session.query(Subscription).filter_by(chat_id=chat_id).delete()
+
+    def claim_deliveries(
+        self,
+        projects: List[Dict[str, Any]],
+        routes: Dict[str, Iterable[int]],
+        detect_updates: bool = True,
+    ) -> Tuple[Dict[int, List[str]], Dict[int, List[str]]]:
+        """Регистрирует проекты и атомарно резервирует доставку каждому чату.
+
+        routes задаёт project_id -> чаты, которым проект подходит по
+        подпискам. Для каждой новой пары (чат, проект) в той же транзакции
+        создаётся запись в notification_outbox, так что уведомление не
+        теряется, даже если процесс упадёт до отправки. Вариант шаблона чата
+        записывается туда же: notifier в отдельном процессе не держит
+        настроек чатов в памяти.
+
+        Отпечатки уже известных проектов сравниваются одним запросом; для
+        изменившихся в outbox ставятся алерты "update" чатам, которые
+        получали проект и включили /updates.
+
+        Возвращает (новые, обновления) в виде chat_id -> [project_id].
+        """
+        unique_projects = {project["id"]: project for project in projects}
+        if not unique_projects:
+            return {}, {}
+
+        pair_chats = []
+        pair_projects = []
+        for project_id, chat_ids in routes.items():
+            for chat_id in chat_ids:
+                pair_chats.append(chat_id)
+                pair_projects.append(project_id)
+
+        fingerprints = {
+            project_id: fingerprint(project)
+            for project_id, project in unique_projects.items()
+        }
+
+        with self.get_session() as session:
+            known = dict(
+                session.execute(
+                    text(
+                        "SELECT project_id, fingerprint FROM processed_projects "
+                        "WHERE project_id = ANY(CAST(:ids AS VARCHAR[]))"
+                    ),
+                    {"ids": list(unique_projects)},
+                ).all()
+            )
+            stale = [
+                project_id
+                for project_id, stored in known.items()
+                if stored != fingerprints[project_id]
+            ]
+
+            new_projects = [
+                {
+                    "project_id": project_id,
+                    "title": project.get("title"),
+                    "price": project.get("price"),
+                    "fingerprint": fingerprints[project_id],
+                }
+                for project_id, project in unique_projects.items()
+                if project_id not in known
+            ]
+            inserted = 0
+            if new_projects:
+                inserted = session.execute(
+                    insert(ProcessedProject)
+                    .values(new_projects)
+                    .on_conflict_do_nothing(index_elements=["project_id"])
+                ).rowcount
+
+            updates: Dict[int, List[str]] = {}
+            changed = {}
+            if stale:
+                session.execute(
+                    text(
+                        "UPDATE processed_projects p SET fingerprint = v.fingerprint "
+                        "FROM unnest(CAST(:ids AS VARCHAR[]), CAST(:fps AS BIGINT[])) "
+                        "AS v(project_id, fingerprint) "
+                        "WHERE p.project_id = v.project_id"
+                    ),
+                    {"ids": stale, "fps": [fingerprints[pid] for pid in stale]},
+                )
+                # NULL - отпечаток ещё не считался (старые записи), это не изменение
+                changed = {
+                    project_id: unique_projects[project_id]
+                    for project_id in stale
+                    if known[project_id] is not None
+                }
+                if changed and detect_updates:
+                    updates = self._queue_updates(session, changed)
+                if changed:
+                    self._archive_projects(
+                        session, changed.values(), update_existing=True
+                    )
+
+            self._archive_projects(session, unique_projects.values())
+
+            rows = []
+            if pair_chats:
+                rows = session.execute(
+                    text(
+                        "INSERT INTO project_deliveries (chat_id, project_id) "
+                        "SELECT * FROM unnest("
+                        "CAST(:chat_ids AS BIGINT[]), CAST(:project_ids AS VARCHAR[])) "
+                        "ON CONFLICT DO NOTHING "
+                        "RETURNING chat_id, project_id"
+                    ),
+                    {"chat_ids": pair_chats, "project_ids": pair_projects},
+                ).all()
+
+            if rows:
+                templates = dict(
+                    session.execute(
+                        text(
+                            "SELECT chat_id, template FROM monitoring_settings "
+                            "WHERE chat_id = ANY(CAST(:chat_ids AS BIGINT[]))"
+                        ),
+                        {"chat_ids": list({chat_id for chat_id, _ in rows})},
+                    ).all()
+                )
+                session.execute(
+                    insert(NotificationOutbox),
+                    [
+                        {
+                            "chat_id": chat_id,
+                            "project_id": project_id,
+                            "payload": unique_projects[project_id],
+                            "template": templates.get(chat_id),
+                        }
+                        for chat_id, project_id in rows
+                    ],
+                )
+            if rows or updates:
+                # Доставляется notifier'ам только после коммита транзакции
+                session.execute(text(f"NOTIFY {OUTBOX_CHANNEL}"))
+
+            self._bump_stats(
+                session,
+                seen=len(unique_projects),
+                new=inserted,
+                updated=len(changed),
+                prices=[
+                    unique_projects[row["project_id"]].get("price_value")
+                    for row in new_projects
+                ],
+            )
+            if inserted:
+                self._bump_counter(session, "processed_projects", inserted)
+
+        deliveries: Dict[int, List[str]] = {}
+        for chat_id, project_id in rows:
+            deliveries.setdefault(chat_id, []).append(project_id)
+        return deliveries, updates
+
+    def _queue_updates(
+        self, session, changed: Dict[str, Dict[str, Any]]
+    ) -> Dict[int, List[str]]:
+        """Ставит в outbox алерты об изменении проекта с диффом полей"""
+        previous = session.execute(
+            text(
+                "SELECT project_id, title, description AS full_description, price, "
+                "price_value, extract(epoch FROM expires_at) AS expires_at "
+                "FROM project_archive WHERE project_id = ANY(CAST(:ids AS VARCHAR[]))"
+            ),
+            {"ids": list(changed)},
+        ).mappings()
+
+        diffs = {}
+        for row in previous:
+            changes = diff(dict(row), changed[row["project_id"]])
+            if changes:
+                diffs[row["project_id"]] = changes
+        if not diffs:
+            return {}
+
+        recipients = session.execute(
+            text(
+                "SELECT d.chat_id, d.project_id FROM project_deliveries d "
+                "JOIN monitoring_settings m ON m.chat_id = d.chat_id "
+                "WHERE m.notify_updates AND d.project_id = ANY(CAST(:ids AS VARCHAR[]))"
+            ),
+            {"ids": list(diffs)},
+        ).all()
+        if not recipients:
+            return {}
+
+        session.execute(
+            insert(NotificationOutbox),
+            [
+                {
+                    "chat_id": chat_id,
+                    "project_id": project_id,
+                    "kind": "update",
+                    "payload": {**changed[project_id], "changes": diffs[project_id]},
+                }
+                for chat_id, project_id in recipients
+            ],
+        )
+
+        updates: Dict[int, List[str]] = {}
+        for chat_id, project_id in recipients:
+            updates.setdefault(chat_id, []).append(project_id)
+        return updates
+
+    def _archive_projects(self, session, projects, update_existing: bool = False):
+        statement = insert(ArchivedProject).values(
+            [
+                {
+                    "project_id": project["id"],
+                    "title": project.get("title"),
+                    "description": project.get(
+                        "full_description", project.get("description")
+                    ),
+                    "username": project.get("username"),
+                    "price": project.get("price"),
+                    "price_value": project.get("price_value"),
+                    "expires_at": (
+                        datetime.fromtimestamp(project["expires_at"], timezone.utc)
+                        if project.get("expires_at")
+                        else None
+                    ),
+                    "url": project.get("url"),
+                }
+                for project in projects
+            ]
+        )
+        if update_existing:
+            statement = statement.on_conflict_do_update(
+                index_elements=["project_id"],
+                set_={
+                    column: statement.excluded[column]
+                    for column in (
+                        "title",
+                        "description",
+                        "price",
+                        "price_value",
+                        "expires_at",
+                    )
+                },
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=["project_id"])
+        session.execute(statement)
+
+    def search_projects(
+        self, query: str, limit: int = 5, offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """Полнотекстовый поиск по архиву с ранжированием.
+
+        Совпадения по tsvector дополняются триграммным сходством заголовка,
+        чтобы находились опечатки и части слов. Возвращает страницу и флаг
+        наличия следующей страницы.
+        """
+        statement = text(
+            "WITH q AS (SELECT websearch_to_tsquery('russian', :query) AS tsq) "
+            "SELECT a.project_id, a.title, a.price, a.username, a.url, "
+            "ts_rank_cd(a.search_vector, q.tsq) + similarity(a.title, :query) AS rank "
+            "FROM project_archive a, q "
+            "WHERE a.search_vector @@ q.tsq OR a.title % :query "
+            "ORDER BY rank DESC, a.created_at DESC "
+            "LIMIT :limit OFFSET :offset"
+        )
+        with self.get_session() as session:
+            rows = (
+                session.execute(
+                    statement, {"query": query, "limit": limit + 1, "offset": offset}
+                )
+                .mappings()
+                .all()
+            )
+
+        return [dict(row) for row in rows[:limit]], len(rows) > limit
+
+    def toggle_watch(self, chat_id: int, project_id: str) -> Optional[bool]:
+        """Добавляет проект в отслеживание чата или убирает его оттуда.
+
+        Возвращает True, если проект добавлен, False, если убран, и None,
+        если проекта нет в архиве.
+        """
+        with self.get_session() as session:
+            removed = session.execute(
+                text(
+                    "DELETE FROM watchlist "
+                    "WHERE chat_id = :chat_id AND project_id = :project_id"
+                ),
+                {"chat_id": chat_id, "project_id": project_id},
+            ).rowcount
+            if removed:
+                self._drop_unwatched(session, [project_id])
+                return False
+
+            added = session.execute(
+                text(
+                    "INSERT INTO watched_projects "
+                    "(project_id, title, url, expires_at) "
+                    "SELECT project_id, title, url, expires_at FROM project_archive "
+                    "WHERE project_id = :project_id "
+                    "ON CONFLICT (project_id) DO UPDATE "
+                    "SET title = EXCLUDED.title "
+                    "RETURNING project_id"
+                ),
+                {"project_id": project_id},
+            ).first()
+            if not added:
+                return None
+
+            session.execute(
+                text(
+                    "INSERT INTO watchlist (chat_id, project_id) "
+                    "VALUES (:chat_id, :project_id) ON CONFLICT DO NOTHING"
+                ),
+                {"chat_id": chat_id, "project_id": project_id},
+            )
+            return True
+
+    def get_watchlist(self, chat_id: int) -> List[Dict[str, Any]]:
+        with self.get_session() as session:
+            rows = session.execute(
+                text(
+                    "SELECT p.project_id, p.title, p.url, p.status, p.offers, "
+                    "p.expires_at FROM watchlist w "
+                    "JOIN watched_projects p ON p.project_id = w.project_id "
+                    "WHERE w.chat_id = :chat_id ORDER BY p.expires_at NULLS LAST"
+                ),
+                {"chat_id": chat_id},
+            ).mappings()
+            return [dict(row) for row in rows]
+
+    def lease_watches(self, batch_size: int, lease_seconds: int) -> List[Dict]:
+        """Забирает отслеживаемые проекты, которым пора на повторный опрос,
+        вместе со списком следящих чатов"""
+        statement = text(
+            "UPDATE watched_projects p "
+            "SET next_poll_at = now() + make_interval(secs => :lease) "
+            "WHERE project_id IN ("
+            "SELECT project_id FROM watched_projects WHERE next_poll_at <= now() "
+            "ORDER BY next_poll_at LIMIT :batch FOR UPDATE SKIP LOCKED) "
+            "RETURNING project_id, title, url, status, offers, etag, last_modified, "
+            "extract(epoch FROM expires_at) AS expires_at, "
+            "ARRAY(SELECT chat_id FROM watchlist w "
+            "WHERE w.project_id = p.project_id) AS chat_ids"
+        )
+        with self.get_session() as session:
+            rows = session.execute(
+                statement, {"batch": batch_size, "lease": lease_seconds}
+            ).mappings()
+            return [dict(row) for row in rows]
+
+    def save_watch_poll(
+        self,
+        project_id: str,
+        status: Optional[str],
+        offers: Optional[int],
+        etag: Optional[str],
+        last_modified: Optional[str],
+        next_in: float,
+    ):
+        with self.get_session() as session:
+            session.execute(
+                text(
+                    "UPDATE watched_projects SET status = coalesce(:status, status), "
+                    "offers = coalesce(:offers, offers), etag = :etag, "
+                    "last_modified = :last_modified, "
+                    "next_poll_at = now() + make_interval(secs => :next_in) "
+                    "WHERE project_id = :project_id"
+                ),
+                {
+                    "project_id": project_id,
+                    "status": status,
+                    "offers": offers,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "next_in": next_in,
+                },
+            )
+
+    def drop_watches(
+        self, project_ids: Iterable[str] = (), max_age_days: Optional[int] = None
+    ) -> int:
+        """Убирает из отслеживания переданные, истёкшие и слишком старые проекты"""
+        with self.get_session() as session:
+            dropped = session.execute(
+                text(
+                    "DELETE FROM watched_projects "
+                    "WHERE project_id = ANY(CAST(:ids AS VARCHAR[])) "
+                    "OR expires_at < now() "
+                    "OR (CAST(:days AS INTEGER) IS NOT NULL "
+                    "AND created_at < now() - make_interval(days => :days)) "
+                    "RETURNING project_id"
+                ),
+                {"ids": list(project_ids), "days": max_age_days},
+            ).scalars().all()
+            if dropped:
+                session.execute(
+                    text(
+                        "DELETE FROM watchlist "
+                        "WHERE project_id = ANY(CAST(:ids AS VARCHAR[]))"
+                    ),
+                    {"ids": dropped},
+                )
+        return len(dropped)
+
+    def _drop_unwatched(self, session, project_ids: List[str]):
+        session.execute(
+            text(
+                "DELETE FROM watched_projects p "
+                "WHERE p.project_id = ANY(CAST(:ids AS VARCHAR[])) "
+                "AND NOT EXISTS (SELECT 1 FROM watchlist w "
+                "WHERE w.project_id = p.project_id)"
+            ),
+            {"ids": project_ids},
+        )
+
+    def lease_outbox(self, max_chats: int, lease_seconds: int) -> List[Dict]:
+        """Забирает на отправку все готовые уведомления для max_chats чатов.
+
+        Записи чата арендуются целиком, а не срезом ORDER BY id: fan-out
+        одной проверки пишет их вперемешку по чатам, и только так всплеск
+        для чата целиком попадает в одну пачку и уходит одним дайджестом.
+
+        FOR UPDATE SKIP LOCKED позволяет нескольким воркерам разбирать очередь
+        параллельно, а аренда (locked_until) возвращает в очередь записи
+        воркера, упавшего посреди отправки. lease_token отличает эту аренду
+        от последующих: продлить и завершить запись может только её владелец.
+        """
+        ready = (
+            "((status = 'pending' AND next_attempt_at <= now()) "
+            "OR (status = 'sending' AND locked_until < now()))"
+        )
+        statement = text(
+            "UPDATE notification_outbox SET status = 'sending', "
+            "attempts = attempts + 1, lease_token = :token, "
+            "locked_until = now() + make_interval(secs => :lease) "
+            "WHERE id IN ("
+            f"SELECT id FROM notification_outbox WHERE {ready} AND chat_id IN ("
+            f"SELECT chat_id FROM notification_outbox WHERE {ready} "
+            "GROUP BY chat_id ORDER BY min(id) LIMIT :chats) "
+            "FOR UPDATE SKIP LOCKED) "
+            "RETURNING id, chat_id, project_id, kind, payload, template, attempts, "
+            "lease_token"
+        )
+        params = {
+            "chats": max_chats,
+            "lease": lease_seconds,
+            "token": uuid.uuid4().hex,
+        }
+        with self.get_session() as session:
+            rows = session.execute(statement, params).mappings().all()
+        return sorted((dict(row) for row in rows), key=lambda row: row["id"])
+
+    def extend_outbox_lease(
+        self, entry_ids: List[int], lease_token: str, lease_seconds: int
+    ) -> Set[int]:
+        """Продлевает аренду перед отправкой; возвращает id записей,
+        которые всё ещё принадлежат этой аренде"""
+        with self.get_session() as session:
+            held = session.execute(
+                text(
+                    "UPDATE notification_outbox "
+                    "SET locked_until = now() + make_interval(secs => :lease) "
+                    "WHERE id = ANY(CAST(:ids AS BIGINT[])) "
+                    "AND status = 'sending' AND lease_token = :token "
+                    "RETURNING id"
+                ),
+                {"ids": list(entry_ids), "token": lease_token, "lease": lease_seconds},
+            ).scalars()
+            return set(held)
+
+    def complete_outbox(self, entry_ids: List[int], lease_token: str) -> List[float]:
+        """Помечает записи отправленными и сохраняет задержку доставки.
+
+        Записи, аренду которых уже перехватил другой воркер, не трогаются.
+        Возвращает задержки (сек) для записей, у которых известно время
+        публикации проекта.
+        """
+        with self.get_session() as session:
+            row = session.execute(
+                text(
+                    "WITH sent AS ("
+                    "UPDATE notification_outbox SET status = 'sent', "
+                    "sent_at = now(), locked_until = NULL "
+                    "WHERE id = ANY(CAST(:ids AS BIGINT[])) "
+                    "AND status = 'sending' AND lease_token = :token "
+                    "RETURNING chat_id, project_id, kind, "
+                    "CAST(payload->>'posted_at' AS DOUBLE PRECISION) AS posted), "
+                    "latency AS ("
+                    "INSERT INTO delivery_latency "
+                    "(chat_id, project_id, posted_at, delivered_at, latency_seconds) "
+                    "SELECT chat_id, project_id, to_timestamp(posted), now(), "
+                    "greatest(extract(epoch FROM now()) - posted, 0) "
+                    "FROM sent WHERE kind = 'new' AND posted IS NOT NULL "
+                    "RETURNING latency_seconds) "
+                    "SELECT (SELECT count(*) FROM sent) AS sent, "
+                    "ARRAY(SELECT latency_seconds FROM latency) AS latencies"
+                ),
+                {"ids": list(entry_ids), "token": lease_token},
+            ).one()
+            if row.sent:
+                self._bump_stats(session, notified=row.sent)
+        if row.sent < len(entry_ids):
+            logger.warning(
+                "⚠️ Аренда outbox потеряна до завершения: %d из %d записей",
+                len(entry_ids) - row.sent,
+                len(entry_ids),
+            )
+        return list(row.latencies)
+
+    def latency_summary(self, chat_id: Optional[int] = None, hours: int = 24):
+        """Перцентили задержки доставки за последние hours часов: общие и
+        по часам. Без chat_id считается по всем чатам.
+        """
+        chat_filter = "AND chat_id = :chat_id " if chat_id is not None else ""
+        params = {"hours": hours, "chat_id": chat_id}
+        percentiles = (
+            "count(*) AS count, percentile_cont(ARRAY[0.5, 0.95, 0.99]) "
+            "WITHIN GROUP (ORDER BY latency_seconds) AS p"
+        )
+        window = (
+            "FROM delivery_latency "
+            "WHERE delivered_at >= now() - make_interval(hours => :hours) "
+            + chat_filter
+        )
+
+        with self.get_session() as session:
+            total = session.execute(
+                text(f"SELECT {percentiles} {window}"), params
+            ).one()
+            hourly = session.execute(
+                text(
+                    f"SELECT date_trunc('hour', delivered_at) AS hour, {percentiles} "
+                    f"{window} GROUP BY hour ORDER BY hour DESC"
+                ),
+                params,
+            ).all()
+
+        def pack(row):
+            p50, p95, p99 = row.p or (None, None, None)
+            return {"count": row.count, "p50": p50, "p95": p95, "p99": p99}
+
+        return {
+            **pack(total),
+            "hourly": [{"hour": row.hour, **pack(row)} for row in hourly],
+        }
+
+    def _bump_stats(
+        self,
+        session,
+        seen: int = 0,
+        new: int = 0,
+        updated: int = 0,
+        notified: int = 0,
+        failed: int = 0,
+        prices: Iterable[Optional[float]] = (),
+    ):
+        """Наращивает счётчики текущего часа в транзакции самого события"""
+        buckets = price_histogram(prices)
+        session.execute(
+            text(
+                "INSERT INTO stats_hourly AS s "
+                "(hour, seen, new, updated, notified, failed, price_buckets) "
+                "VALUES (date_trunc('hour', now()), :seen, :new, :updated, "
+                ":notified, :failed, CAST(:buckets AS INTEGER[])) "
+                "ON CONFLICT (hour) DO UPDATE SET "
+                "seen = s.seen + EXCLUDED.seen, new = s.new + EXCLUDED.new, "
+                "updated = s.updated + EXCLUDED.updated, "
+                "notified = s.notified + EXCLUDED.notified, "
+                "failed = s.failed + EXCLUDED.failed, "
+                "price_buckets = CASE WHEN s.price_buckets IS NULL "
+                "THEN EXCLUDED.price_buckets ELSE ARRAY("
+                "SELECT coalesce(a, 0) + coalesce(b, 0) "
+                "FROM unnest(s.price_buckets, EXCLUDED.price_buckets) "
+                "WITH ORDINALITY AS t(a, b, i) ORDER BY i) END"
+            ),
+            {
+                "seen": seen,
+                "new": new,
+                "updated": updated,
+                "notified": notified,
+                "failed": failed,
+                "buckets": buckets if any(buckets) else None,
+            },
+        )
+
+    def _bump_counter(self, session, name: str, delta: int):
+        session.execute(
+            text(
+                "INSERT INTO stats_counters AS c (name, value) VALUES (:name, :delta) "
+                "ON CONFLICT (name) DO UPDATE SET value = c.value + EXCLUDED.value"
+            ),
+            {"name": name, "delta": delta},
+        )
+
+    def get_counter(self, name: str) -> int:
+        with self.get_session() as session:
+            value = session.execute(
+                text("SELECT value FROM stats_counters WHERE name = :name"),
+                {"name": name},
+            ).scalar()
+        return value or 0
+
+    def stats_summary(self, hours: int = 24) -> Dict[str, Any]:
+        """Сводка по почасовым счётчикам: не больше hours строк по ключу"""
+        with self.get_session() as session:
+            rows = session.execute(
+                text(
+                    "SELECT hour, seen, new, updated, notified, failed, price_buckets "
+                    "FROM stats_hourly "
+                    "WHERE hour >= date_trunc('hour', now()) - make_interval(hours => :hours) "
+                    "ORDER BY hour"
+                ),
+                {"hours": hours - 1},
+            ).all()
+            processed = session.execute(
+                text(
+                    "SELECT value FROM stats_counters WHERE name = 'processed_projects'"
+                )
+            ).scalar()
+
+        totals = {"seen": 0, "new": 0, "updated": 0, "notified": 0, "failed": 0}
+        buckets: List[int] = []
+        for row in rows:
+            for key in totals:
+                totals[key] += getattr(row, key)
+            for index, count in enumerate(row.price_buckets or []):
+                if index >= len(buckets):
+                    buckets.append(0)
+                buckets[index] += count
+
+        return {
+            **totals,
+            "processed": processed or 0,
+            "hours": hours,
+            "new_per_hour": totals["new"] / hours,
+            "busiest_hour": max(rows, key=lambda row: row.new).hour if rows else None,
+            "median_price": approx_median(buckets),
+        }
+
+    def cleanup_stats(self, max_age_days: int) -> int:
+        with self.get_session() as session:
+            return session.execute(
+                text(
+                    "DELETE FROM stats_hourly "
+                    "WHERE hour < now() - make_interval(days => :days)"
+                ),
+                {"days": max_age_days},
+            ).rowcount
+
+    def cleanup_latency(self, max_age_days: int) -> int:
+        with self.get_session() as session:
+            return session.execute(
+                text(
+                    "DELETE FROM delivery_latency "
+                    "WHERE delivered_at < now() - make_interval(days => :days)"
+                ),
+                {"days": max_age_days},
+            ).rowcount
+
+    def fail_outbox(
+        self,
+        entry_id: int,
+        lease_token: str,
+        error: str,
+        retry_in: Optional[float] = None,
+    ):
+        """Возвращает запись в очередь через retry_in секунд или помечает failed"""
+        with self.get_session() as session:
+            updated = session.execute(
+                text(
+                    "UPDATE notification_outbox SET "
+                    "status = CASE WHEN :retry IS NULL THEN 'failed' ELSE 'pending' END, "
+                    "next_attempt_at = now() + make_interval(secs => coalesce(:retry, 0)), "
+                    "locked_until = NULL, last_error = :error "
+                    "WHERE id = :id AND status = 'sending' AND lease_token = :token"
+                ),
+                {
+                    "id": entry_id,
+                    "token": lease_token,
+                    "retry": retry_in,
+                    "error": error[:1000],
+                },
+            ).rowcount
+            if updated and retry_in is None:
+                self._bump_stats(session, failed=1)
+
+    def cleanup_outbox(self, max_age_days: int) -> int:
+        with self.get_session() as session:
+            return session.execute(
+                text(
+                    "DELETE FROM notification_outbox "
+                    "WHERE status IN ('sent', 'failed') "
+                    "AND created_at < now() - make_interval(days => :days)"
+                ),
+                {"days": max_age_days},
+            ).rowcount
+
+    def cleanup_old_projects(
+        self, policy: str = "count", max_count: int = 1000, max_age_days: int = 30
+    ) -> int:
+        """Удаляет старые проекты одним set-based запросом"""
+        if policy == "age":
+            statement = text(
+                "DELETE FROM processed_projects "
+                "WHERE created_at < now() - make_interval(days => :days)"
+            )
+            params = {"days": max_age_days}
+        else:
+            statement = text(
+                "DELETE FROM processed_projects WHERE id IN ("
+                "SELECT id FROM processed_projects "
+                "ORDER BY created_at DESC, id DESC OFFSET :keep)"
+            )
+            params = {"keep": max_count}
+
+        with self.get_session() as session:
+            deleted = session.execute(statement, params).rowcount
+            if deleted:
+                self._bump_counter(session, "processed_projects", -deleted)
+                session.execute(
+                    text(
+                        "DELETE FROM project_deliveries d WHERE NOT EXISTS ("
+                        "SELECT 1 FROM processed_projects p "
+                        "WHERE p.project_id = d.project_id)"
+                    )
+                )
+
+        if deleted:
+            logger.info(f"Очищено {deleted} старых проектов (политика: {policy})")
+        return deleted
 
 
 db = Database()
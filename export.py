@@ -0,0 +1,113 @@
+"""Потоковая выгрузка архива проектов в CSV или JSON Lines.
+
+CSV отдаётся самим Postgres через ``COPY ... TO STDOUT``, JSON Lines
+читается серверным (именованным) курсором порциями; оба варианта пишутся
+прямо в gzip-поток, так что память не зависит от размера архива.
+
+    python export.py --format csv --days 30 -o projects.csv.gz
+    python export.py --format jsonl --no-gzip -o - | jq .title
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import BinaryIO, Optional
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl")
+FETCH_SIZE = 2000
+
+EXPORT_QUERY = (
+    "SELECT project_id, title, description, username, price, price_value, url, "
+    "created_at, expires_at FROM project_archive "
+    "WHERE %(days)s IS NULL OR created_at >= now() - make_interval(days => %(days)s) "
+    "ORDER BY created_at"
+)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Не сериализуется в JSON: {type(value).__name__}")
+
+
+@contextmanager
+def _output(fileobj: BinaryIO, compress: bool):
+    if not compress:
+        yield fileobj
+        return
+    with gzip.GzipFile(fileobj=fileobj, mode="wb") as stream:
+        yield stream
+
+
+def export_projects(
+    fileobj: BinaryIO,
+    fmt: str = "csv",
+    days: Optional[int] = None,
+    compress: bool = True,
+) -> int:
+    """Пишет архив в fileobj и возвращает число выгруженных проектов"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+
+    connection = db.engine.raw_connection()
+    try:
+        with _output(fileobj, compress) as stream:
+            if fmt == "csv":
+                cursor = connection.cursor()
+                query = cursor.mogrify(EXPORT_QUERY, {"days": days}).decode()
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", stream)
+                exported = cursor.rowcount
+            else:
+                cursor = connection.cursor(name="project_export")
+                cursor.itersize = FETCH_SIZE
+                cursor.execute(EXPORT_QUERY, {"days": days})
+                columns = None
+                exported = 0
+                for row in cursor:
+                    if columns is None:
+                        columns = [column.name for column in cursor.description]
+                    line = json.dumps(
+                        dict(zip(columns, row)),
+                        ensure_ascii=False,
+                        default=_json_default,
+                    )
+                    stream.write(line.encode("utf-8") + b"\n")
+                    exported += 1
+            cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+
+    logger.info("📤 Выгружено проектов: %d (%s)", exported, fmt)
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--days", type=int, help="только за последние N дней")
+    parser.add_argument("-o", "--output", default="-", help="файл или - для stdout")
+    parser.add_argument("--no-gzip", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    if args.output == "-":
+        export_projects(sys.stdout.buffer, args.format, args.days, not args.no_gzip)
+    else:
+        with open(args.output, "wb") as fileobj:
+            export_projects(fileobj, args.format, args.days, not args.no_gzip)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Локальная замена Telegram Bot API для нагрузочных тестов без сети.
+
+Понимает методы, которыми пользуется бот (getMe, sendMessage, getUpdates,
+answerCallbackQuery, ...), записывает отправленные сообщения и умеет
+имитировать задержку API, лимиты на чат и ответы 429 с ``retry_after``.
+
+    server = FakeTelegramServer(latency=0.05, chat_interval=1.0)
+    await server.start()
+    bot = server.make_bot()
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiohttp import web
+
+BOT_USER = {
+    "id": 123456,
+    "is_bot": True,
+    "first_name": "Fake Kwork Bot",
+    "username": "fake_kwork_bot",
+}
+
+
+class FakeTelegramServer:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        chat_interval: float = 0.0,
+        group_interval: float = 0.0,
+        retry_rate: float = 0.0,
+        retry_after: int = 1,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.retry_rate = retry_rate
+        self.retry_after = retry_after
+
+        self.sent: List[Dict[str, Any]] = []
+        self.calls: Dict[str, int] = {}
+        self.first_call_at: Dict[str, float] = {}  # метод -> time.perf_counter()
+        self.rejected = 0
+
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._chat_last: Dict[int, float] = {}
+        self._updates: List[Dict[str, Any]] = []
+        self._updates_ready = asyncio.Event()
+
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def make_bot(self, token: str = "123456:FAKE-TOKEN") -> Bot:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.url))
+        return Bot(token=token, session=session, parse_mode=ParseMode.HTML)
+
+    async def wait_for_call(self, method: str, timeout: float = 30.0) -> float:
+        """Ждёт первого вызова метода и возвращает его время (perf_counter)"""
+        deadline = time.perf_counter() + timeout
+        while method not in self.first_call_at:
+            if time.perf_counter() > deadline:
+                raise asyncio.TimeoutError(f"{method} не был вызван за {timeout} сек")
+            await asyncio.sleep(0.005)
+        return self.first_call_at[method]
+
+    def inject_message(self, chat_id: int, text: str, user_id: Optional[int] = None):
+        """Кладёт синтетическое сообщение в очередь getUpdates"""
+        user_id = user_id or chat_id
+        update_id = next(self._update_ids)
+        self._updates.append(
+            {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": self._chat_type(chat_id)},
+                    "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+                    "text": text,
+                },
+            }
+        )
+        self._updates_ready.set()
+
+    @staticmethod
+    def _chat_type(chat_id: int) -> str:
+        return "supergroup" if chat_id < 0 else "private"
+
+    @staticmethod
+    def _ok(result: Any) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    def _too_many_requests(self, retry_after: int) -> web.Response:
+        self.rejected += 1
+        return web.json_response(
+            {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            },
+            status=429,
+        )
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.first_call_at.setdefault(method, time.perf_counter())
+        params = dict(await request.post())
+
+        if method == "getUpdates":
+            return await self._get_updates(params)
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+        if method == "getMe":
+            return self._ok(BOT_USER)
+        if method in ("sendMessage", "sendDocument", "editMessageText"):
+            return self._send_message(method, params)
+        return self._ok(True)
+
+    def _send_message(self, method: str, params: Dict[str, Any]) -> web.Response:
+        chat_id = int(params["chat_id"])
+        now = time.monotonic()
+
+        if self.retry_rate and random.random() < self.retry_rate:
+            return self._too_many_requests(self.retry_after)
+
+        interval = self.group_interval if chat_id < 0 else self.chat_interval
+        last = self._chat_last.get(chat_id)
+        if interval and last is not None and now - last < interval:
+            return self._too_many_requests(math.ceil(interval - (now - last)))
+        self._chat_last[chat_id] = now
+
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": self._chat_type(chat_id)},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+        self.sent.append(
+            {
+                "method": method,
+                "chat_id": chat_id,
+                "text": params.get("text", ""),
+                "reply_markup": json.loads(params.get("reply_markup") or "null"),
+                "received_at": time.perf_counter(),
+            }
+        )
+        return self._ok(message)
+
+    async def _get_updates(self, params: Dict[str, Any]) -> web.Response:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._updates_ready.clear()
+            try:
+                await asyncio.wait_for(self._updates_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        limit = int(params.get("limit") or 100)
+        return self._ok(self._updates[:limit])
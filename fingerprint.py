@@ -0,0 +1,42 @@
+import hashlib
+from typing import Any, Dict, List, Optional
+
+# Поля, изменение которых считается обновлением проекта
+FIELDS = ("title", "price_value", "description", "expires_at")
+
+# Для показа в алерте цена берётся строкой, как в обычном уведомлении
+_DISPLAY_KEYS = {"price_value": "price", "description": "full_description"}
+
+
+def _normalized(project: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    description = project.get("full_description") or project.get("description") or ""
+    price = project.get("price_value")
+    expires = project.get("expires_at")
+    return {
+        "title": (project.get("title") or "").strip(),
+        "price_value": f"{float(price):.2f}" if price is not None else None,
+        "description": " ".join(description.split()),
+        "expires_at": f"{float(expires):.0f}" if expires is not None else None,
+    }
+
+
+def fingerprint(project: Dict[str, Any]) -> int:
+    """64-битный отпечаток содержимого проекта (BIGINT в Postgres)"""
+    data = _normalized(project)
+    raw = "\x1f".join(data[field] or "" for field in FIELDS)
+    digest = hashlib.blake2b(raw.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Список изменившихся полей со старым и новым значением для показа"""
+    old_data, new_data = _normalized(old), _normalized(new)
+    changes = []
+    for field in FIELDS:
+        # У старых записей архива срок не сохранён, это не изменение
+        if field == "expires_at" and old_data[field] is None:
+            continue
+        if old_data[field] != new_data[field]:
+            key = _DISPLAY_KEYS.get(field, field)
+            changes.append({"field": field, "old": old.get(key), "new": new.get(key)})
+    return changes
@@ -1,3 +1,5 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 CREATE TABLE IF NOT EXISTS users (
     id SERIAL PRIMARY KEY,
     user_id BIGINT UNIQUE NOT NULL,
@@ -14,18 +16,126 @@ CREATE TABLE IF NOT EXISTS processed_projects (
     project_id VARCHAR(100) UNIQUE NOT NULL,
     title VARCHAR(500),
     price VARCHAR(100),
+    fingerprint BIGINT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE TABLE IF NOT EXISTS project_deliveries (
+    chat_id BIGINT NOT NULL,
+    project_id VARCHAR(100) NOT NULL,
+    delivered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (chat_id, project_id)
+);
+
+CREATE TABLE IF NOT EXISTS project_archive (
+    project_id VARCHAR(100) PRIMARY KEY,
+    title VARCHAR(500),
+    description TEXT,
+    username VARCHAR(100),
+    price VARCHAR(100),
+    price_value NUMERIC(12, 2),
+    expires_at TIMESTAMPTZ,
+    url VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian'::regconfig, coalesce(description, '')), 'B')
+    ) STORED
+);
+
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    chat_id BIGINT NOT NULL,
+    project_id VARCHAR(100) NOT NULL,
+    kind VARCHAR(20) NOT NULL DEFAULT 'new',
+    payload JSON NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMP,
+    lease_token VARCHAR(32),
+    template VARCHAR(20),
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS delivery_latency (
+    id BIGSERIAL PRIMARY KEY,
+    chat_id BIGINT NOT NULL,
+    project_id VARCHAR(100) NOT NULL,
+    posted_at TIMESTAMPTZ NOT NULL,
+    delivered_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    latency_seconds DOUBLE PRECISION NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stats_hourly (
+    hour TIMESTAMPTZ PRIMARY KEY,
+    seen INTEGER NOT NULL DEFAULT 0,
+    new INTEGER NOT NULL DEFAULT 0,
+    updated INTEGER NOT NULL DEFAULT 0,
+    notified INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    price_buckets INTEGER[]
+);
+
+CREATE TABLE IF NOT EXISTS stats_counters (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS watched_projects (
+    project_id VARCHAR(100) PRIMARY KEY,
+    title VARCHAR(500),
+    url VARCHAR(255) NOT NULL,
+    expires_at TIMESTAMPTZ,
+    status VARCHAR(30),
+    offers INTEGER,
+    etag VARCHAR(255),
+    last_modified VARCHAR(100),
+    next_poll_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS watchlist (
+    chat_id BIGINT NOT NULL,
+    project_id VARCHAR(100) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (chat_id, project_id)
+);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+    chat_id BIGINT PRIMARY KEY,
+    include_keywords JSON NOT NULL DEFAULT '[]',
+    exclude_keywords JSON NOT NULL DEFAULT '[]',
+    min_price NUMERIC(12, 2),
+    max_price NUMERIC(12, 2),
+    blocked_users JSON NOT NULL DEFAULT '[]',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS monitoring_settings (
     id SERIAL PRIMARY KEY,
     chat_id BIGINT UNIQUE NOT NULL,
     is_active BOOLEAN DEFAULT FALSE,
     last_check TIMESTAMP,
     check_interval INTEGER DEFAULT 120,
+    template VARCHAR(20) DEFAULT 'full',
+    notify_updates BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE INDEX IF NOT EXISTS idx_pp_created ON processed_projects(created_at);
+CREATE INDEX IF NOT EXISTS idx_pd_project ON project_deliveries(project_id);
+CREATE INDEX IF NOT EXISTS idx_archive_search ON project_archive USING gin(search_vector);
+CREATE INDEX IF NOT EXISTS idx_archive_title_trgm ON project_archive USING gin(title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_archive_price ON project_archive(price_value);
+CREATE INDEX IF NOT EXISTS idx_archive_created ON project_archive(created_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_ready ON notification_outbox(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_created ON notification_outbox(created_at);
+CREATE INDEX IF NOT EXISTS idx_latency_chat ON delivery_latency(chat_id, delivered_at);
+CREATE INDEX IF NOT EXISTS idx_latency_delivered ON delivery_latency(delivered_at);
+CREATE INDEX IF NOT EXISTS idx_watched_next_poll ON watched_projects(next_poll_at);
+CREATE INDEX IF NOT EXISTS idx_watchlist_project ON watchlist(project_id);
 CREATE INDEX IF NOT EXISTS idx_users_id ON users(user_id);
 CREATE INDEX IF NOT EXISTS idx_monitoring_chat ON monitoring_settings(chat_id);
@@ -1,3 +1,5 @@
+from typing import List, Tuple
+
 from aiogram.types import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -50,3 +52,43 @@ def get_proxy_keyboard() -> InlineKeyboardMarkup:
         ]
     )
     return keyboard
+
+
+def get_search_keyboard(page: int, has_next: bool) -> InlineKeyboardMarkup:
+    buttons = []
+    if page > 0:
+        buttons.append(
+            InlineKeyboardButton(text="◀️ Назад", callback_data=f"search:{page - 1}")
+        )
+    if has_next:
+        buttons.append(
+            InlineKeyboardButton(text="Вперёд ▶️", callback_data=f"search:{page + 1}")
+        )
+    return InlineKeyboardMarkup(inline_keyboard=[buttons] if buttons else [])
+
+
+def get_digest_keyboard(
+    items: List[Tuple[int, str]], row_width: int = 5
+) -> InlineKeyboardMarkup:
+    """Кнопки «открыть» для дайджеста: номер проекта -> ссылка"""
+    buttons = [
+        InlineKeyboardButton(text=f"🔗 {number}", url=url) for number, url in items
+    ]
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            buttons[i : i + row_width] for i in range(0, len(buttons), row_width)
+        ]
+    )
+
+
+def get_project_keyboard(project_id: str, url: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="🔗 Открыть", url=url),
+                InlineKeyboardButton(
+                    text="👁 Следить", callback_data=f"watch:{project_id}"
+                ),
+            ]
+        ]
+    )
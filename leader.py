@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Callable, Optional
+
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class AdvisoryLeader:
+    """Выбор единственного fetcher'а через advisory lock Postgres.
+
+    Блокировка живёт, пока открыто держащее её соединение: если процесс
+    падает или теряет связь с БД, Postgres снимает её сам, и один из
+    резервных fetcher'ов забирает лидерство при следующей попытке.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        lock_key: int,
+        retry_interval: float = 10.0,
+        check_interval: float = 10.0,
+    ):
+        self.engine = engine
+        self.lock_key = lock_key
+        self.retry_interval = retry_interval
+        self.check_interval = check_interval
+        self._connection = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._connection is not None
+
+    def _try_lock(self) -> bool:
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+            acquired = cursor.fetchone()[0]
+            connection.commit()
+        except Exception:
+            connection.invalidate()
+            raise
+
+        if acquired:
+            connection.detach()  # блокировку держит соединение вне пула
+            self._connection = connection
+        else:
+            connection.close()
+        return acquired
+
+    def _ping(self):
+        cursor = self._connection.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        self._connection.commit()
+
+    async def acquire(self):
+        """Ждёт, пока этот процесс не станет лидером"""
+        announced = False
+        while True:
+            try:
+                if await asyncio.to_thread(self._try_lock):
+                    logger.info(f"👑 Лидерство получено (lock {self.lock_key})")
+                    return
+            except Exception as e:
+                logger.error(f"❌ Ошибка захвата advisory lock: {e}")
+
+            if not announced:
+                logger.info("⏳ Другой fetcher активен, работаем в резерве...")
+                announced = True
+            await asyncio.sleep(self.retry_interval)
+
+    async def hold(self):
+        """Возвращается, когда соединение с блокировкой потеряно"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await asyncio.to_thread(self._ping)
+            except Exception as e:
+                logger.error(f"❌ Потеряно соединение с блокировкой лидера: {e}")
+                with suppress(Exception):
+                    self._connection.invalidate()
+                self._connection = None
+                return
+
+    async def release(self):
+        if not self._connection:
+            return
+
+        def unlock():
+            cursor = self._connection.cursor()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (self.lock_key,))
+            self._connection.commit()
+            self._connection.close()
+
+        try:
+            await asyncio.to_thread(unlock)
+        except Exception as e:
+            logger.error(f"❌ Ошибка освобождения advisory lock: {e}")
+        finally:
+            self._connection = None
+
+
+class NotifyListener:
+    """LISTEN на канале Postgres без отдельного потока: сокет psycopg2
+    регистрируется в event loop, и ``callback`` вызывается на каждый NOTIFY.
+    """
+
+    def __init__(self, engine: Engine, channel: str, callback: Callable[[], None]):
+        self.engine = engine
+        self.channel = channel
+        self.callback = callback
+        self._connection = None
+        self._fileno: Optional[int] = None
+
+    async def start(self):
+        def connect():
+            connection = self.engine.raw_connection()
+            connection.detach()  # соединение живёт отдельно от пула
+            connection.driver_connection.autocommit = True
+            connection.cursor().execute(f"LISTEN {self.channel}")
+            return connection
+
+        self._connection = await asyncio.to_thread(connect)
+        self._fileno = self._connection.driver_connection.fileno()
+        asyncio.get_running_loop().add_reader(self._fileno, self._on_readable)
+        logger.info(f"👂 Подписка на уведомления канала {self.channel}")
+
+    def _on_readable(self):
+        driver = self._connection.driver_connection
+        try:
+            driver.poll()
+        except Exception as e:
+            logger.error(f"❌ Ошибка LISTEN-соединения: {e}")
+            self.stop()
+            return
+
+        if driver.notifies:
+            driver.notifies.clear()
+            self.callback()
+
+    def stop(self):
+        if self._fileno is not None:
+            with suppress(Exception):
+                asyncio.get_running_loop().remove_reader(self._fileno)
+            self._fileno = None
+        if self._connection is not None:
+            with suppress(Exception):
+                self._connection.close()
+            self._connection = None
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import suppress
+from typing import Dict, List, Optional, Tuple
+
+from metrics import EVENT_LOOP_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+Frame = Tuple[str, int, str]
+
+
+class LoopMonitor:
+    """Замер опоздания event loop и поиск блокирующих вызовов.
+
+    Корутина-сэмплер засыпает на ``interval`` и меряет, насколько позже она
+    проснулась. Параллельно поток-сторож следит за её пульсом: если loop не
+    отвечает дольше ``threshold``, он снимает стек потока loop через
+    ``sys._current_frames()`` — это и есть код, который держит loop.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.2, depth: int = 8):
+        self.interval = interval
+        self.threshold = threshold
+        self.depth = depth
+
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._offenders: Dict[Tuple[Frame, ...], Dict] = {}
+
+        self._beat = 0.0
+        self._stall_stack: Optional[Tuple[Frame, ...]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            "🩺 Монитор event loop запущен (порог %.0f мс)", self.threshold * 1000
+        )
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        await asyncio.to_thread(self._watchdog.join)
+        self._watchdog = None
+
+    def reset(self):
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._offenders.clear()
+
+    async def _sample(self):
+        while True:
+            self._beat = time.monotonic()
+            expected = self._beat + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+
+            lag = max(0.0, now - expected)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+            stack, self._stall_stack = self._stall_stack, None
+            if lag >= self.threshold:
+                self.stalls += 1
+                if stack:
+                    self._record(stack, lag)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval / 2):
+            if self._stall_stack is not None:
+                continue
+            if time.monotonic() - self._beat < self.interval + self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._stall_stack = tuple(
+                (item.filename, item.lineno, item.name)
+                for item in traceback.extract_stack(frame, limit=self.depth)
+            )
+
+    def _record(self, stack: Tuple[Frame, ...], lag: float):
+        stats = self._offenders.setdefault(
+            stack, {"count": 0, "total": 0.0, "max": 0.0}
+        )
+        stats["count"] += 1
+        stats["total"] += lag
+        stats["max"] = max(stats["max"], lag)
+        logger.warning(
+            "🐌 Event loop заблокирован на %.0f мс: %s", lag * 1000, describe(stack)
+        )
+
+    def offenders(self, limit: int = 5) -> List[Dict]:
+        ranked = sorted(
+            self._offenders.items(), key=lambda item: item[1]["total"], reverse=True
+        )
+        return [
+            {"where": describe(stack), **stats} for stack, stats in ranked[:limit]
+        ]
+
+
+def describe(stack: Tuple[Frame, ...]) -> str:
+    """Самый глубокий кадр нашего кода и, если он глубже, кадр библиотеки"""
+
+    def fmt(frame: Frame) -> str:
+        filename, lineno, name = frame
+        return f"{os.path.basename(filename)}:{lineno} {name}"
+
+    innermost = stack[-1]
+    own = [frame for frame in stack if frame[0].startswith(PROJECT_DIR)]
+    if not own:
+        return fmt(innermost)
+    if own[-1] == innermost:
+        return fmt(innermost)
+    return f"{fmt(own[-1])} → {fmt(innermost)}"
@@ -0,0 +1,288 @@
+import logging
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SubscriptionRule:
+    include: FrozenSet[str] = field(default_factory=frozenset)
+    exclude: FrozenSet[str] = field(default_factory=frozenset)
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    blocked_users: FrozenSet[str] = field(default_factory=frozenset)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SubscriptionRule":
+        def words(key):
+            return frozenset(w.lower() for w in data.get(key) or [] if w)
+
+        def price(key):
+            return float(data[key]) if data.get(key) is not None else None
+
+        return cls(
+            include=words("include_keywords"),
+            exclude=words("exclude_keywords"),
+            min_price=price("min_price"),
+            max_price=price("max_price"),
+            blocked_users=words("blocked_users"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "include_keywords": sorted(self.include),
+            "exclude_keywords": sorted(self.exclude),
+            "min_price": self.min_price,
+            "max_price": self.max_price,
+            "blocked_users": sorted(self.blocked_users),
+        }
+
+
+class AhoCorasick:
+    """Автомат Ахо-Корасик: все ключевые слова ищутся за один проход по тексту.
+
+    Совпадение засчитывается только целым словом: символы по обе стороны от
+    него не должны быть буквами или цифрами, иначе «бот» находился бы
+    в «работа».
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+
+        for pattern in patterns:
+            self._add(pattern)
+        self._build_failure_links()
+
+    def _add(self, pattern: str):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = next_state
+        self._output[state].add(pattern)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        last = len(text) - 1
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state] or (end < last and text[end + 1].isalnum()):
+                continue
+            for pattern in output[state]:
+                start = end - len(pattern)
+                if start < 0 or not text[start].isalnum():
+                    found.add(pattern)
+        return found
+
+
+class SubscriptionMatcher:
+    """Общий матчер подписок всех чатов.
+
+    Ключевые слова всех подписок собраны в один автомат, границы цен лежат
+    в отсортированных списках, поэтому маршрутизация проекта стоит один
+    проход по его тексту независимо от числа подписок. Множества чатов,
+    отсеянных по цене, и подписок без include-слов, прошедших по цене,
+    считаются один раз на ценовой интервал и переиспользуются до следующего
+    изменения подписок. При изменении подписки обновляются только её
+    записи; автомат пересобирается, лишь когда меняется общий словарь
+    ключевых слов.
+    """
+
+    def __init__(self):
+        self._rules: Dict[int, SubscriptionRule] = {}
+        self._include: Dict[str, Set[int]] = {}
+        self._exclude: Dict[str, Set[int]] = {}
+        self._blocked: Dict[str, Set[int]] = {}
+        self._any_keyword: Set[int] = set()  # подписки без include-слов
+        self._min_prices: List[Tuple[float, int]] = []
+        self._max_prices: List[Tuple[float, int]] = []
+        self._automaton: Optional[AhoCorasick] = None
+        self._vocabulary_changed = True
+        # Ценовой интервал -> (отсеянные по цене, подписки без include-слов)
+        self._price_points: List[float] = []
+        self._buckets: Optional[Dict[Optional[int], Tuple[FrozenSet[int], ...]]] = None
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def get(self, chat_id: int) -> Optional[SubscriptionRule]:
+        return self._rules.get(chat_id)
+
+    def load(self, rules: Dict[int, SubscriptionRule]):
+        for chat_id, rule in rules.items():
+            self.update(chat_id, rule)
+        logger.info(f"Загружено подписок: {len(self._rules)}")
+
+    def update(self, chat_id: int, rule: SubscriptionRule):
+        self.remove(chat_id)
+        self._rules[chat_id] = rule
+        self._buckets = None
+
+        for word in rule.include:
+            self._index_add(self._include, word, chat_id)
+        for word in rule.exclude:
+            self._index_add(self._exclude, word, chat_id)
+        for username in rule.blocked_users:
+            self._blocked.setdefault(username, set()).add(chat_id)
+        if not rule.include:
+            self._any_keyword.add(chat_id)
+        if rule.min_price is not None:
+            insort(self._min_prices, (rule.min_price, chat_id))
+        if rule.max_price is not None:
+            insort(self._max_prices, (rule.max_price, chat_id))
+
+    def remove(self, chat_id: int):
+        rule = self._rules.pop(chat_id, None)
+        if rule is None:
+            return
+        self._buckets = None
+
+        for word in rule.include:
+            self._index_remove(self._include, word, chat_id)
+        for word in rule.exclude:
+            self._index_remove(self._exclude, word, chat_id)
+        for username in rule.blocked_users:
+            chats = self._blocked.get(username)
+            if chats:
+                chats.discard(chat_id)
+                if not chats:
+                    del self._blocked[username]
+        self._any_keyword.discard(chat_id)
+        if rule.min_price is not None:
+            self._min_prices.remove((rule.min_price, chat_id))
+        if rule.max_price is not None:
+            self._max_prices.remove((rule.max_price, chat_id))
+
+    def _index_add(self, index: Dict[str, Set[int]], word: str, chat_id: int):
+        if word not in self._include and word not in self._exclude:
+            self._vocabulary_changed = True
+        index.setdefault(word, set()).add(chat_id)
+
+    def _index_remove(self, index: Dict[str, Set[int]], word: str, chat_id: int):
+        chats = index.get(word)
+        if not chats:
+            return
+        chats.discard(chat_id)
+        if not chats:
+            del index[word]
+            if word not in self._include and word not in self._exclude:
+                self._vocabulary_changed = True
+
+    def _get_automaton(self) -> AhoCorasick:
+        if self._vocabulary_changed or self._automaton is None:
+            self._automaton = AhoCorasick(set(self._include) | set(self._exclude))
+            self._vocabulary_changed = False
+        return self._automaton
+
+    def _price_rejected(self, price: float) -> Set[int]:
+        rejected = {
+            chat_id
+            for _, chat_id in self._min_prices[
+                bisect_right(self._min_prices, (price, float("inf"))) :
+            ]
+        }
+        rejected.update(
+            chat_id
+            for _, chat_id in self._max_prices[
+                : bisect_left(self._max_prices, (price, float("-inf")))
+            ]
+        )
+        return rejected
+
+    def _price_bucket(
+        self, price: Optional[float]
+    ) -> Tuple[FrozenSet[int], FrozenSet[int]]:
+        """(чаты, отсеянные по цене; подписки без include-слов, прошедшие по
+        цене) для ценового интервала, в который попадает price"""
+        if self._buckets is None:
+            self._price_points = sorted(
+                {value for value, _ in self._min_prices}
+                | {value for value, _ in self._max_prices}
+            )
+            self._buckets = {}
+
+        key = None
+        if price is not None:
+            # Чётные ключи — интервалы между границами, нечётные — сами границы
+            index = bisect_left(self._price_points, price)
+            on_point = (
+                index < len(self._price_points) and self._price_points[index] == price
+            )
+            key = 2 * index + 1 if on_point else 2 * index
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rejected = frozenset(
+                self._price_rejected(price) if price is not None else ()
+            )
+            bucket = (rejected, frozenset(self._any_keyword - rejected))
+            self._buckets[key] = bucket
+        return bucket
+
+    def route(self, project: Dict[str, Any], chat_ids: Iterable[int]) -> Set[int]:
+        """Возвращает чаты из chat_ids, которым подходит проект"""
+        chat_ids = set(chat_ids)
+        unfiltered = chat_ids.difference(self._rules)
+        candidates = chat_ids - unfiltered
+        if not candidates:
+            return unfiltered
+
+        description = project.get("full_description") or project.get("description")
+        text = f"{project.get('title') or ''} {description or ''}".lower()
+        hits = self._get_automaton().find(text)
+
+        price = project.get("price_value")
+        rejected, passing = self._price_bucket(
+            float(price) if price is not None else None
+        )
+
+        # Все операции идут по малым множествам: кандидатам и чатам найденных слов
+        matched = candidates & passing
+        for word in hits:
+            chats = self._include.get(word)
+            if chats:
+                matched |= (chats & candidates) - rejected
+        for word in hits:
+            chats = self._exclude.get(word)
+            if chats:
+                matched -= chats
+
+        blocked = self._blocked.get((project.get("username") or "").lower())
+        if blocked:
+            matched -= blocked
+
+        return unfiltered | matched
+
+    def route_many(
+        self, projects: List[Dict[str, Any]], chat_ids: Iterable[int]
+    ) -> Dict[str, Set[int]]:
+        chat_ids = set(chat_ids)
+        return {project["id"]: self.route(project, chat_ids) for project in projects}
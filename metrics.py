@@ -0,0 +1,124 @@
+import logging
+import time
+
+from aiohttp import web
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Метки держим с низкой кардинальностью: хост прокси, тип операции, имя задачи
+FETCH_SECONDS = Histogram(
+    "kwork_fetch_seconds",
+    "Время запроса к Kwork",
+    ["proxy", "result"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30),
+)
+EXTRACT_SECONDS = Histogram(
+    "kwork_state_extract_seconds",
+    "Время извлечения window.stateData из страницы",
+    ["method"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+BLOCKED_RESPONSES = Counter(
+    "kwork_blocked_responses_total",
+    "Ответы-заглушки антибота вместо страницы Kwork",
+    ["reason"],
+)
+FETCH_RETRIES = Counter("kwork_fetch_retries_total", "Повторных запросов к Kwork")
+RETRY_BUDGET_EXHAUSTED = Counter(
+    "kwork_retry_budget_exhausted_total",
+    "Повторы, отменённые из-за исчерпанного общего бюджета",
+)
+FETCH_DEADLINE_EXCEEDED = Counter(
+    "kwork_fetch_deadline_exceeded_total",
+    "Запросы к Kwork, прерванные по дедлайну проверки",
+)
+PROJECTS_FOUND = Counter("kwork_projects_found_total", "Проектов получено с Kwork")
+PROJECTS_NEW = Counter("kwork_projects_new_total", "Новых проектов отправлено в чаты")
+
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Время выполнения SQL-запросов",
+    ["operation"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5),
+)
+
+SEND_QUEUE_DEPTH = Gauge("telegram_send_queue_depth", "Сообщений в очереди отправки")
+MESSAGES_SENT = Counter(
+    "telegram_messages_sent_total", "Отправлено сообщений", ["priority"]
+)
+TELEGRAM_ERRORS = Counter(
+    "telegram_errors_total", "Ошибки Telegram API", ["error"]
+)
+RETRY_AFTER_SECONDS = Histogram(
+    "telegram_retry_after_seconds",
+    "Ожидание по retry_after от Telegram",
+    buckets=(1, 2, 5, 10, 30, 60, 300),
+)
+
+DETECTION_LATENCY_SECONDS = Histogram(
+    "kwork_detection_latency_seconds",
+    "Время от публикации проекта на Kwork до доставки уведомления",
+    buckets=(15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200),
+)
+
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "Опоздание пробуждения event loop",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+SCHEDULER_LAG_SECONDS = Histogram(
+    "scheduler_lag_seconds",
+    "Опоздание запуска задач планировщика",
+    ["job"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60),
+)
+
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def instrument_engine(engine: Engine):
+    """Замер латентности всех запросов через события SQLAlchemy"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+        if operation not in _SQL_OPERATIONS:
+            operation = "OTHER"
+        DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        connection = context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"📈 Метрики доступны на http://{host}:{port}/metrics")
+    return runner
@@ -1,6 +1,20 @@
 from datetime import datetime
 
-from sqlalchemy import JSON, BigInteger, Boolean, Column, DateTime, Integer, String
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    Column,
+    Computed,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    Text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -27,8 +41,166 @@ class ProcessedProject(Base):
     project_id = Column(String(100), unique=True, nullable=False)
     title = Column(String(500))
     price = Column(String(100))
+    fingerprint = Column(BigInteger)  # отпечаток названия, цены, описания и срока
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("idx_pp_created", "created_at"),)
+
+
+class ProjectDelivery(Base):
+    __tablename__ = "project_deliveries"
+
+    chat_id = Column(BigInteger, primary_key=True)
+    project_id = Column(String(100), primary_key=True)
+    delivered_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("idx_pd_project", "project_id"),)
+
+
+class ArchivedProject(Base):
+    __tablename__ = "project_archive"
+
+    project_id = Column(String(100), primary_key=True)
+    title = Column(String(500))
+    description = Column(Text)
+    username = Column(String(100))
+    price = Column(String(100))
+    price_value = Column(Numeric(12, 2))
+    expires_at = Column(DateTime(timezone=True))
+    url = Column(String(255))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    search_vector = Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('russian'::regconfig, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('russian'::regconfig, coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    )
+
+    __table_args__ = (
+        Index("idx_archive_search", "search_vector", postgresql_using="gin"),
+        Index(
+            "idx_archive_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index("idx_archive_price", "price_value"),
+        Index("idx_archive_created", "created_at"),
+    )
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    id = Column(BigInteger, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    project_id = Column(String(100), nullable=False)
+    kind = Column(String(20), nullable=False, server_default="new")
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, server_default="pending")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    locked_until = Column(DateTime(timezone=True))
+    lease_token = Column(String(32))
+    template = Column(String(20))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("idx_outbox_ready", "status", "next_attempt_at"),
+        Index("idx_outbox_created", "created_at"),
+    )
+
+
+class DeliveryLatency(Base):
+    """Задержка от публикации проекта на Kwork до доставки уведомления"""
+
+    __tablename__ = "delivery_latency"
+
+    id = Column(BigInteger, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    project_id = Column(String(100), nullable=False)
+    posted_at = Column(DateTime(timezone=True), nullable=False)
+    delivered_at = Column(DateTime(timezone=True), server_default=func.now())
+    latency_seconds = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("idx_latency_chat", "chat_id", "delivered_at"),
+        Index("idx_latency_delivered", "delivered_at"),
+    )
+
+
+class StatsHourly(Base):
+    """Почасовые счётчики, которые наращиваются в тех же транзакциях, что и
+    сами события, чтобы /status не сканировал таблицы"""
+
+    __tablename__ = "stats_hourly"
+
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    seen = Column(Integer, nullable=False, server_default="0")
+    new = Column(Integer, nullable=False, server_default="0")
+    updated = Column(Integer, nullable=False, server_default="0")
+    notified = Column(Integer, nullable=False, server_default="0")
+    failed = Column(Integer, nullable=False, server_default="0")
+    price_buckets = Column(ARRAY(Integer))  # гистограмма цен новых проектов
+
+
+class StatsCounter(Base):
+    __tablename__ = "stats_counters"
+
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, server_default="0")
+
+
+class WatchedProject(Base):
+    """Проект в отслеживании: один опрос на проект, сколько бы чатов ни следило"""
+
+    __tablename__ = "watched_projects"
+
+    project_id = Column(String(100), primary_key=True)
+    title = Column(String(500))
+    url = Column(String(255), nullable=False)
+    expires_at = Column(DateTime(timezone=True))
+    status = Column(String(30))
+    offers = Column(Integer)
+    etag = Column(String(255))
+    last_modified = Column(String(100))
+    next_poll_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("idx_watched_next_poll", "next_poll_at"),)
+
+
+class Watch(Base):
+    __tablename__ = "watchlist"
+
+    chat_id = Column(BigInteger, primary_key=True)
+    project_id = Column(String(100), primary_key=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("idx_watchlist_project", "project_id"),)
+
+
+class Subscription(Base):
+    __tablename__ = "subscriptions"
+
+    chat_id = Column(BigInteger, primary_key=True)
+    include_keywords = Column(JSON, nullable=False, default=list)
+    exclude_keywords = Column(JSON, nullable=False, default=list)
+    min_price = Column(Numeric(12, 2))
+    max_price = Column(Numeric(12, 2))
+    blocked_users = Column(JSON, nullable=False, default=list)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
 
 class MonitoringSettings(Base):
     __tablename__ = "monitoring_settings"
@@ -38,4 +210,6 @@ class MonitoringSettings(Base):
     is_active = Column(Boolean, default=False)
     last_check = Column(DateTime(timezone=True))
     check_interval = Column(Integer, default=120)  # seconds
+    template = Column(String(20), default="full", server_default="full")
+    notify_updates = Column(Boolean, default=False, server_default="false")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,172 @@
+import html
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from fingerprint import fingerprint
+from keyboards import get_digest_keyboard
+
+TEMPLATE_VERSION = 1
+DEFAULT_TEMPLATE = "full"
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+DIGEST_MAX_PROJECTS = 50  # не больше 100 кнопок на сообщение
+DIGEST_HEADER_RESERVE = 100
+DIGEST_TITLE_LIMIT = 80
+UPDATE_DESCRIPTION_LIMIT = 300
+
+KWORK_TZ = timezone(timedelta(hours=3))
+UPDATE_FIELD_NAMES = {
+    "title": "Название",
+    "price_value": "Бюджет",
+    "description": "Описание",
+    "expires_at": "Срок приёма заявок",
+}
+
+
+def _escaped(project: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        key: html.escape(str(project.get(key) or ""))
+        for key in ("title", "price", "username", "time_left", "description", "url")
+    }
+
+
+def _render_full(project: Dict[str, Any]) -> str:
+    p = _escaped(project)
+    return f"""🎯 <b>НОВЫЙ ПРОЕКТ НА KWORK</b>
+
+🏷️ <b>{p["title"]}</b>
+
+💰 <b>{p["price"]}</b>
+👤 <b>{p["username"]}</b>
+⏰ <b>{p["time_left"]}</b>
+
+📝 {p["description"]}
+
+🔗 <a href="{p["url"]}">Открыть проект</a>"""
+
+
+def _render_compact(project: Dict[str, Any]) -> str:
+    p = _escaped(project)
+    return (
+        f'🎯 <a href="{p["url"]}">{p["title"]}</a>\n'
+        f"💰 {p['price']} · 👤 {p['username']} · ⏰ {p['time_left']}"
+    )
+
+
+TEMPLATES: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "full": _render_full,
+    "compact": _render_compact,
+}
+
+
+def _format_update_value(field: str, value: Any) -> str:
+    if value is None or value == "":
+        return "—"
+    if field == "expires_at":
+        return datetime.fromtimestamp(float(value), KWORK_TZ).strftime("%d.%m %H:%M")
+    return html.escape(str(value))
+
+
+def render_update(project: Dict[str, Any]) -> str:
+    """Алерт об изменении уже отправленного проекта с диффом полей"""
+    p = _escaped(project)
+    lines = [f"✏️ <b>ПРОЕКТ ОБНОВЛЁН</b>\n\n🏷️ <b>{p['title']}</b>\n"]
+    for change in project.get("changes", []):
+        field = change["field"]
+        name = UPDATE_FIELD_NAMES.get(field, field)
+        if field == "description":
+            text = str(change["new"] or "")
+            if len(text) > UPDATE_DESCRIPTION_LIMIT:
+                text = text[:UPDATE_DESCRIPTION_LIMIT] + "..."
+            lines.append(f"📝 <b>{name}</b> изменено:\n{html.escape(text)}")
+        else:
+            old = _format_update_value(field, change["old"])
+            new = _format_update_value(field, change["new"])
+            lines.append(f"🔄 <b>{name}:</b> <s>{old}</s> → <b>{new}</b>")
+    lines.append(f'\n🔗 <a href="{p["url"]}">Открыть проект</a>')
+    return "\n".join(lines)
+
+
+class NotificationRenderer:
+    """Рендерит уведомление один раз на проект и вариант шаблона.
+
+    Результат кэшируется по (project_id, отпечаток содержимого, версия
+    шаблона, вариант), поэтому fan-out одного проекта по сотне чатов стоит
+    один рендер на каждый используемый вариант, а после правки проекта
+    покупателем текст рендерится заново.
+    """
+
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self._cache: "OrderedDict[Tuple[str, int, int, str], str]" = OrderedDict()
+
+    def render(self, project: Dict[str, Any], variant: str = DEFAULT_TEMPLATE) -> str:
+        if variant not in TEMPLATES:
+            variant = DEFAULT_TEMPLATE
+
+        key = (project["id"], fingerprint(project), TEMPLATE_VERSION, variant)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        rendered = TEMPLATES[variant](project)
+        self._cache[key] = rendered
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return rendered
+
+
+def _digest_line(number: int, project: Dict[str, Any]) -> str:
+    title = project.get("title") or "Без названия"
+    if len(title) > DIGEST_TITLE_LIMIT:
+        title = title[: DIGEST_TITLE_LIMIT - 1] + "…"
+    return (
+        f'{number}. <a href="{html.escape(project.get("url", ""))}">'
+        f"{html.escape(title)}</a> — {html.escape(project.get('price', ''))}"
+    )
+
+
+def build_digest_messages(
+    projects: List[Dict[str, Any]],
+) -> List[Tuple[List[int], str, InlineKeyboardMarkup]]:
+    """Упаковывает проекты в минимальное число сообщений до 4096 символов.
+
+    Возвращает для каждого сообщения индексы вошедших проектов, текст и
+    клавиатуру с кнопками «открыть».
+    """
+    chunks: List[List[Tuple[int, str]]] = []
+    current: List[Tuple[int, str]] = []
+    size = DIGEST_HEADER_RESERVE
+
+    for index, project in enumerate(projects):
+        line = _digest_line(index + 1, project)
+        if current and (
+            size + len(line) + 1 > TELEGRAM_MESSAGE_LIMIT
+            or len(current) >= DIGEST_MAX_PROJECTS
+        ):
+            chunks.append(current)
+            current, size = [], DIGEST_HEADER_RESERVE
+        current.append((index, line))
+        size += len(line) + 1
+
+    if current:
+        chunks.append(current)
+
+    total = len(projects)
+    messages = []
+    for chunk in chunks:
+        first, last = chunk[0][0] + 1, chunk[-1][0] + 1
+        header = f"📦 <b>Новые проекты на Kwork: {total}</b>"
+        if len(chunks) > 1:
+            header += f" ({first}–{last})"
+        text = header + "\n\n" + "\n".join(line for _, line in chunk)
+        keyboard = get_digest_keyboard(
+            [(index + 1, projects[index].get("url", "")) for index, _ in chunk]
+        )
+        messages.append(([index for index, _ in chunk], text, keyboard))
+
+    return messages
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import random
+from contextlib import aclosing, suppress
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from database import db
+from metrics import DETECTION_LATENCY_SECONDS
+from perf import perf
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых повторять отправку бессмысленно
+PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError)
+
+
+class OutboxWorker:
+    """Разбирает notification_outbox пачками с повторами и backoff.
+
+    Каждая запись арендуется перед отправкой и помечается отправленной сразу
+    после успешного send_message, поэтому после падения воркера переотправка
+    возможна только для сообщений, отправленных в последний момент перед
+    падением. Перед каждой отправкой аренда продлевается, а запись, которую
+    уже перехватил другой воркер, пропускается.
+
+    Пачка — все готовые записи ``batch_size`` чатов. Если для чата
+    набирается ``digest_threshold`` новых проектов, они уходят одним
+    дайджестом через ``deliver_digest``: он отдаёт порциями записи,
+    попавшие в каждое отправленное сообщение дайджеста.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[Dict], Awaitable[None]],
+        deliver_digest: Optional[
+            Callable[[int, List[Dict]], AsyncIterator[List[Dict]]]
+        ] = None,
+        digest_threshold: int = 0,
+        batch_size: int = 50,
+        lease_seconds: int = 120,
+        poll_interval: float = 5.0,
+        max_attempts: int = 8,
+        backoff_base: float = 5.0,
+        backoff_max: float = 900.0,
+    ):
+        self.deliver = deliver
+        self.deliver_digest = deliver_digest
+        self.digest_threshold = digest_threshold
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def kick(self):
+        """Будит воркер сразу после появления новых записей"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                drained = await self.drain_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки outbox: {e}")
+                drained = 0
+
+            if drained >= self.batch_size:
+                continue
+
+            self._wakeup.clear()
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+
+    async def drain_once(self) -> int:
+        with perf.trace("outbox"):
+            return await self._drain()
+
+    async def _drain(self) -> int:
+        with perf.span("lease"):
+            entries = await asyncio.to_thread(
+                db.lease_outbox, self.batch_size, self.lease_seconds
+            )
+        if not entries:
+            return 0
+
+        tasks = []
+        by_chat: Dict[int, List[Dict]] = {}
+        for entry in entries:
+            if entry["kind"] == "new":
+                by_chat.setdefault(entry["chat_id"], []).append(entry)
+            else:
+                tasks.append(self._process(entry))
+
+        for chat_id, chat_entries in by_chat.items():
+            if (
+                self.deliver_digest
+                and self.digest_threshold
+                and len(chat_entries) >= self.digest_threshold
+            ):
+                tasks.append(self._process_digest(chat_id, chat_entries))
+            else:
+                tasks.extend(self._process(entry) for entry in chat_entries)
+
+        with perf.span("send"):
+            await asyncio.gather(*tasks)
+        return len(entries)
+
+    async def _hold(self, entries: List[Dict]) -> bool:
+        """Продлевает аренду записей; False, если хоть одну уже перехватили"""
+        held = await asyncio.to_thread(
+            db.extend_outbox_lease,
+            [entry["id"] for entry in entries],
+            entries[0]["lease_token"],
+            self.lease_seconds,
+        )
+        if len(held) == len(entries):
+            return True
+        logger.warning(
+            "⚠️ Аренда outbox перехвачена, пропускаем отправку %d записей в чат %s",
+            len(entries),
+            entries[0]["chat_id"],
+        )
+        return False
+
+    async def _process_digest(self, chat_id: int, entries: List[Dict]):
+        pending = {entry["id"]: entry for entry in entries}
+        try:
+            # Генератор шлёт следующее сообщение только по запросу, так что
+            # аренда продлевается перед каждой отправкой
+            if not await self._hold(entries):
+                return
+            async with aclosing(self.deliver_digest(chat_id, entries)) as messages:
+                async for sent in messages:
+                    sent_ids = [entry["id"] for entry in sent]
+                    await self._complete(sent_ids, entries[0]["lease_token"])
+                    for entry_id in sent_ids:
+                        pending.pop(entry_id, None)
+                    if pending and not await self._hold(list(pending.values())):
+                        return
+        except Exception as e:
+            logger.error(f"❌ Ошибка отправки дайджеста в чат {chat_id}: {e}")
+            for entry in pending.values():
+                await self._fail(entry, e)
+
+    async def _process(self, entry: Dict):
+        try:
+            if not await self._hold([entry]):
+                return
+            await self.deliver(entry)
+        except Exception as e:
+            await self._fail(entry, e)
+            logger.error(
+                "❌ Ошибка отправки уведомления %s в чат %s (попытка %d): %s",
+                entry["project_id"],
+                entry["chat_id"],
+                entry["attempts"],
+                e,
+            )
+            return
+
+        await self._complete([entry["id"]], entry["lease_token"])
+
+    async def _complete(self, entry_ids: List[int], lease_token: str):
+        latencies = await asyncio.to_thread(db.complete_outbox, entry_ids, lease_token)
+        for seconds in latencies:
+            DETECTION_LATENCY_SECONDS.observe(seconds)
+
+    async def _fail(self, entry: Dict, error: Exception):
+        await asyncio.to_thread(
+            db.fail_outbox,
+            entry["id"],
+            entry["lease_token"],
+            str(error),
+            self._retry_delay(entry, error),
+        )
+
+    def _retry_delay(self, entry: Dict, error: Exception) -> Optional[float]:
+        if isinstance(error, PERMANENT_ERRORS) or entry["attempts"] >= self.max_attempts:
+            return None
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (entry["attempts"] - 1))
+        return random.uniform(delay / 2, delay)
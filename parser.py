@@ -3,17 +3,83 @@ import json
 import logging
 import random
 import re
-from typing import Any, Dict, List, Optional
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import aiohttp
 from aiohttp_socks import ProxyConnector, SocksConnector
-from bs4 import BeautifulSoup
 
 from config import config
+from metrics import (
+    BLOCKED_RESPONSES,
+    EXTRACT_SECONDS,
+    FETCH_DEADLINE_EXCEEDED,
+    FETCH_RETRIES,
+    FETCH_SECONDS,
+    RETRY_BUDGET_EXHAUSTED,
+)
+from perf import perf
 from proxy_manager import ProxyManager
+from retry_budget import backoff_delay, retry_budget
 
 logger = logging.getLogger(__name__)
 
+STATE_DATA_PATTERN = re.compile(r"window\.stateData\s*=\s*({.*?});", re.DOTALL)
+
+# Маркеры страниц антибота и капчи; ищутся только в начале ответа без stateData
+BLOCK_MARKERS = {
+    "captcha": (
+        "captcha",
+        "smartcaptcha",
+        "g-recaptcha",
+        "подтвердите, что вы не робот",
+    ),
+    "challenge": (
+        "cf-chl",
+        "challenge-platform",
+        "just a moment",
+        "checking your browser",
+        "ddos-guard",
+        "__qrator",
+    ),
+    "blocked": ("access denied", "доступ ограничен", "подозрительная активность"),
+}
+BLOCK_SCAN_BYTES = 16384
+MIN_PAGE_SIZE = 2000
+
+
+def classify_response(
+    status: int, headers: Mapping[str, str], html: str
+) -> Optional[str]:
+    """Быстрая проверка, что 200-ответ — страница блокировки, а не Kwork.
+
+    Возвращает причину ("challenge", "captcha", "blocked", "not_html",
+    "too_short") или None для нормальной страницы. Настоящая страница
+    проектов всегда содержит stateData, поэтому дорогой поиск маркеров
+    идёт только если его нет.
+    """
+    if headers.get("cf-mitigated") == "challenge":
+        return "challenge"
+    if "window.stateData" in html:
+        return None
+
+    content_type = headers.get("Content-Type", "")
+    if content_type and "html" not in content_type:
+        return "not_html"
+
+    head = html[:BLOCK_SCAN_BYTES].lower()
+    for reason, markers in BLOCK_MARKERS.items():
+        if any(marker in head for marker in markers):
+            return reason
+    if len(html) < MIN_PAGE_SIZE:
+        return "too_short"
+    return None
+
+
+# Даты в wants отдаются по московскому времени без указания зоны
+KWORK_TZ = timezone(timedelta(hours=3))
+
 
 class KworkParser:
     def __init__(self, proxy_manager: Optional[ProxyManager] = None):
@@ -56,6 +122,8 @@ class KworkParser:
                 "headers": self.kwork_headers,
                 "timeout": aiohttp.ClientTimeout(total=config.PROXY_TIMEOUT),
             }
+            if perf.enabled:
+                session_kwargs["trace_configs"] = [self._connect_trace_config()]
 
             if self.proxy_manager:
                 self.current_proxy = self.proxy_manager.get_next_proxy()
@@ -66,8 +134,12 @@ class KworkParser:
                     port = self.current_proxy.get("port", "unknown")
                     country = self.current_proxy.get("country", "Unknown")
 
-                    logger.info(
-                        f"Используем прокси: {host}:{port} ({country}) - {self.current_proxy['type']}"
+                    logger.debug(
+                        "Используем прокси: %s:%s (%s) - %s",
+                        host,
+                        port,
+                        country,
+                        self.current_proxy["type"],
                     )
 
                     if self.current_proxy["type"] in ["socks4", "socks5"]:
@@ -96,10 +168,35 @@ class KworkParser:
             logger.error(f"Ошибка создания сессии: {e}")
             return None
 
+    @staticmethod
+    def _connect_trace_config() -> aiohttp.TraceConfig:
+        """Отдельный замер установки соединения (через прокси) для /perf"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_start(session, ctx, params):
+            ctx.connect_started = time.perf_counter()
+
+        async def on_end(session, ctx, params):
+            perf.add("proxy_connect", time.perf_counter() - ctx.connect_started)
+
+        trace_config.on_connection_create_start.append(on_start)
+        trace_config.on_connection_create_end.append(on_end)
+        return trace_config
+
     async def _make_request_with_retry(
-        self, url: str, max_retries: int = 3
+        self, url: str, max_retries: int = 3, deadline: Optional[float] = None
     ) -> Optional[str]:
+        """GET с повторами из общего бюджета retry_budget.
+
+        deadline — момент по часам event loop, после которого запрос
+        прерывается и новые попытки не начинаются.
+        """
+        loop = asyncio.get_running_loop()
         for attempt in range(max_retries):
+            if attempt and not await self._wait_retry(attempt, deadline):
+                break
+
+            started = None
             try:
                 if not self.session:
                     self.session = await self._create_session()
@@ -107,53 +204,184 @@ class KworkParser:
                         logger.error("Не удалось создать сессию")
                         continue
 
-                logger.info(
-                    f"Делаем запрос к {url} (попытка {attempt + 1}/{max_retries})"
+                logger.debug(
+                    "Делаем запрос к %s (попытка %d/%d)", url, attempt + 1, max_retries
                 )
 
-                async with self.session.get(url) as response:
-                    logger.info(f"Получен ответ: статус {response.status}")
+                started = time.perf_counter()
+                with perf.span("download"):
+                    async with asyncio.timeout_at(deadline):
+                        async with self.session.get(url) as response:
+                            status = response.status
+                            html = await response.text() if status == 200 else None
+                            headers = response.headers
+
+                logger.debug("Получен ответ: статус %s", status)
+
+                block = classify_response(status, headers, html) if html else None
+                if block:
+                    self._observe_fetch(started, "blocked")
+                    BLOCKED_RESPONSES.labels(block).inc()
+                    logger.warning(
+                        "Страница блокировки (%s) вместо ответа, меняем прокси...",
+                        block,
+                    )
+                    if self.proxy_manager and self.current_proxy:
+                        self.proxy_manager.mark_failure(self.current_proxy["url"])
+                    await self._rotate_proxy()
+                    continue
 
-                    if response.status == 200:
-                        html = await response.text()
+                if status == 200:
+                    self._observe_fetch(started, "ok")
+                    retry_budget.record_success()
 
-                        if self.proxy_manager and self.current_proxy:
-                            self.proxy_manager.mark_success(self.current_proxy["url"])
+                    if self.proxy_manager and self.current_proxy:
+                        self.proxy_manager.mark_success(self.current_proxy["url"])
 
-                        return html
-                    else:
-                        logger.warning(f"Статус ответа {response.status} для {url}")
+                    return html
+                else:
+                    self._observe_fetch(started, "http_error")
+                    logger.warning("Статус ответа %s для %s", status, url)
 
-                        if self.proxy_manager and self.current_proxy:
-                            self.proxy_manager.mark_failure(self.current_proxy["url"])
+                    if self.proxy_manager and self.current_proxy:
+                        self.proxy_manager.mark_failure(self.current_proxy["url"])
 
-                        if response.status in [403, 429]:
-                            logger.info(
-                                f"Обнаружена блокировка (статус {response.status}), меняем прокси..."
-                            )
-                            await self._rotate_proxy()
-                            continue
+                    if status in [403, 429]:
+                        logger.info(
+                            "Обнаружена блокировка (статус %s), меняем прокси...", status
+                        )
+                        await self._rotate_proxy()
+                        continue
 
             except aiohttp.ClientError as e:
+                self._observe_fetch(started, "client_error")
                 logger.error(
-                    f"Ошибка запроса (попытка {attempt + 1}/{max_retries}): {e}"
+                    "Ошибка запроса (попытка %d/%d): %s", attempt + 1, max_retries, e
                 )
 
                 if self.proxy_manager and self.current_proxy:
                     self.proxy_manager.mark_failure(self.current_proxy["url"])
 
                 await self._rotate_proxy()
-
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2**attempt)
                 continue
 
+            except TimeoutError:
+                if deadline is not None and loop.time() >= deadline:
+                    self._observe_fetch(started, "deadline")
+                    FETCH_DEADLINE_EXCEEDED.inc()
+                    logger.warning("⏱️ Запрос к %s прерван по дедлайну проверки", url)
+                else:
+                    logger.error("Таймаут запроса к %s", url)
+                break
+
             except Exception as e:
                 logger.error(f"Неожиданная ошибка при запросе: {e}")
                 break
 
         return None
 
+    async def _wait_retry(self, attempt: int, deadline: Optional[float]) -> bool:
+        """Пауза с full jitter перед повтором; False — повторять нельзя"""
+        delay = backoff_delay(
+            attempt - 1, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY
+        )
+        now = asyncio.get_running_loop().time()
+        if deadline is not None and now + delay >= deadline:
+            FETCH_DEADLINE_EXCEEDED.inc()
+            logger.warning("⏱️ Повтор запроса не успевает до дедлайна проверки")
+            return False
+
+        if not retry_budget.try_spend():
+            RETRY_BUDGET_EXHAUSTED.inc()
+            logger.warning("🪫 Бюджет повторов запросов к Kwork исчерпан")
+            return False
+
+        FETCH_RETRIES.inc()
+        await asyncio.sleep(delay)
+        return True
+
+    async def fetch_conditional(
+        self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> Tuple[int, Optional[str], Optional[str], Optional[str]]:
+        """Один условный запрос для повторного опроса страницы проекта.
+
+        Возвращает (статус, html, etag, last_modified); на 304 тела нет, а
+        при сетевой ошибке статус 0.
+        """
+        if not self.session:
+            self.session = await self._create_session()
+            if not self.session:
+                return 0, None, etag, last_modified
+
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        started = time.perf_counter()
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                status = response.status
+                html = await response.text() if status == 200 else None
+                if html and classify_response(status, response.headers, html):
+                    status, html = 0, None
+                else:
+                    etag = response.headers.get("ETag", etag)
+                    last_modified = response.headers.get(
+                        "Last-Modified", last_modified
+                    )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Общий таймаут сессии aiohttp бросает голый TimeoutError
+            self._observe_fetch(started, "client_error")
+            logger.debug("Ошибка повторного опроса %s: %r", url, e)
+            if self.proxy_manager and self.current_proxy:
+                self.proxy_manager.mark_failure(self.current_proxy["url"])
+            return 0, None, etag, last_modified
+
+        ok = status in (200, 304, 404)
+        if status == 0:
+            result = "blocked"
+        elif status == 304:
+            result = "not_modified"
+        else:
+            result = "ok" if ok else "http_error"
+        self._observe_fetch(started, result)
+        if ok:
+            retry_budget.record_success()
+        if self.proxy_manager and self.current_proxy:
+            if ok:
+                self.proxy_manager.mark_success(self.current_proxy["url"])
+            else:
+                self.proxy_manager.mark_failure(self.current_proxy["url"])
+        return status, html, etag, last_modified
+
+    @staticmethod
+    def parse_project_state(html: str) -> Dict[str, Any]:
+        """Статус проекта и число предложений из stateData страницы проекта"""
+        match = STATE_DATA_PATTERN.search(html)
+        if not match:
+            return {}
+        try:
+            state_data = json.loads(match.group(1))
+        except json.JSONDecodeError:
+            return {}
+
+        want = state_data.get("want") or state_data.get("wantData") or {}
+        offers = want.get("kwork_count", want.get("offersCount"))
+        return {
+            "status": want.get("status"),
+            "offers": int(offers) if str(offers).isdigit() else None,
+        }
+
+    def _observe_fetch(self, started: Optional[float], result: str):
+        if started is None:
+            return
+        proxy = "direct"
+        if self.current_proxy:
+            proxy = str(self.current_proxy.get("host", "unknown"))
+        FETCH_SECONDS.labels(proxy, result).observe(time.perf_counter() - started)
+
     async def _rotate_proxy(self):
         """Сменить прокси и пересоздать сессию"""
         if self.session:
@@ -166,19 +394,21 @@ class KworkParser:
                 host = self.current_proxy.get("host", "unknown")
                 port = self.current_proxy.get("port", "unknown")
                 country = self.current_proxy.get("country", "Unknown")
-                logger.info(f"Сменили прокси на: {host}:{port} ({country})")
+                logger.info("Сменили прокси на: %s:%s (%s)", host, port, country)
             else:
                 logger.info("Нет доступных прокси, используем прямое подключение")
 
         self.session = await self._create_session()
 
-    async def get_projects(self) -> List[Dict[str, Any]]:
+    async def get_projects(
+        self, deadline: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         """Fetch projects from Kwork"""
         try:
-            logger.info("🔍 Запрос к Kwork...")
+            logger.debug("🔍 Запрос к Kwork...")
             url = "https://kwork.ru/projects"
 
-            html = await self._make_request_with_retry(url)
+            html = await self._make_request_with_retry(url, deadline=deadline)
 
             if not html:
                 logger.error("❌ Не удалось получить данные с Kwork после всех попыток")
@@ -188,23 +418,28 @@ class KworkParser:
                 logger.error(f"❌ Получен слишком короткий ответ: {len(html)} символов")
                 return []
 
-            pattern = r"window\.stateData\s*=\s*({.*?});"
-            match = re.search(pattern, html, re.DOTALL)
+            with EXTRACT_SECONDS.labels("regex").time(), perf.span("extract"):
+                match = STATE_DATA_PATTERN.search(html)
 
             if match:
                 try:
-                    state_data = json.loads(match.group(1))
+                    with perf.span("json_decode"):
+                        state_data = json.loads(match.group(1))
 
                     if state_data.get("wantsListData", {}).get("wants"):
                         projects = state_data["wantsListData"]["wants"]
-                        logger.info(f"📊 Найдено проектов: {len(projects)}")
-                        return self._parse_projects(projects)
+                        logger.debug("📊 Найдено проектов: %d", len(projects))
+                        with perf.span("parse"):
+                            return self._parse_projects(projects)
                 except json.JSONDecodeError as e:
                     logger.error(f"❌ Ошибка парсинга JSON: {e}")
 
             logger.info("Пробуем альтернативный метод парсинга...")
-            soup = BeautifulSoup(html, "html.parser")
-            script_tags = soup.find_all("script")
+            with EXTRACT_SECONDS.labels("soup").time(), perf.span("soup_fallback"):
+                from bs4 import BeautifulSoup  # тяжёлый импорт, нужен редко
+
+                soup = BeautifulSoup(html, "html.parser")
+                script_tags = soup.find_all("script")
 
             for script in script_tags:
                 if script.string and "window.stateData" in script.string:
@@ -248,15 +483,19 @@ class KworkParser:
                 description = project.get("description", "Без описания")
                 description = re.sub(r"<[^>]+>", "", description)
                 description = description.replace("\r\n", " ")
+                full_description = description
                 words = description.split()
                 description = (
                     " ".join(words[:30]) + "..." if len(words) > 30 else description
                 )
 
                 price = "Цена не указана"
+                price_value = None
                 if project.get("priceLimit") and project["priceLimit"] != "0":
+                    price_value = self._parse_price(project["priceLimit"])
                     price = f"{float(project['priceLimit']):.0f} руб."
                 elif project.get("possiblePriceLimit"):
+                    price_value = self._parse_price(project["possiblePriceLimit"])
                     price = f"{project['possiblePriceLimit']} руб."
 
                 username = project.get("user", {}).get("username", "Аноним")
@@ -266,15 +505,41 @@ class KworkParser:
                     "id": project_id,
                     "title": title,
                     "description": description,
+                    "full_description": full_description,
                     "price": price,
+                    "price_value": price_value,
                     "username": username,
                     "time_left": time_left,
+                    "posted_at": self._parse_kwork_time(
+                        project.get("date_create") or project.get("date_active")
+                    ),
+                    "expires_at": self._parse_kwork_time(project.get("date_expire")),
                     "url": f"https://kwork.ru/projects/view/{project_id}",
                 }
 
                 parsed_projects.append(project_data)
 
             except Exception as e:
-                logger.error(f"❌ Ошибка парсинга проекта: {e}")
+                logger.error("❌ Ошибка парсинга проекта: %s", e)
 
         return parsed_projects
+
+    @staticmethod
+    def _parse_price(value: Any) -> Optional[float]:
+        try:
+            return float(str(value).replace(" ", "").replace(",", "."))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _parse_kwork_time(value: Any) -> Optional[float]:
+        """Дата из wants (unix-время или строка по Москве) в unix-время"""
+        if not value:
+            return None
+        try:
+            if isinstance(value, (int, float)) or str(value).isdigit():
+                return float(value)
+            posted = datetime.strptime(str(value), "%Y-%m-%d %H:%M:%S")
+            return posted.replace(tzinfo=KWORK_TZ).timestamp()
+        except (TypeError, ValueError):
+            return None
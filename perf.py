@@ -0,0 +1,116 @@
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from config import config
+
+_NULL_SPAN = nullcontext()
+
+
+class CheckTrace:
+    def __init__(self, label: str):
+        self.label = label
+        self.started_at = datetime.now()
+        self.total = 0.0
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+_current_trace: ContextVar[Optional[CheckTrace]] = ContextVar(
+    "perf_trace", default=None
+)
+
+
+class _Span:
+    __slots__ = ("trace", "stage", "started")
+
+    def __init__(self, trace: CheckTrace, stage: str):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.add(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def _percentile(values: List[float], q: float) -> float:
+    index = min(len(values) - 1, int(round(q * (len(values) - 1))))
+    return values[index]
+
+
+class PerfRecorder:
+    """Тайминги этапов проверки в скользящем окне последних трасс.
+
+    Трасса текущей проверки передаётся через contextvar, поэтому парсер и БД
+    пишут свои этапы без проброса объектов. Выключенный рекордер отдаёт
+    общий nullcontext, и span() стоит один вызов функции.
+    """
+
+    def __init__(self, enabled: bool = False, window: int = 200):
+        self.enabled = enabled
+        self._traces: Deque[CheckTrace] = deque(maxlen=window)
+
+    @contextmanager
+    def trace(self, label: str):
+        if not self.enabled:
+            yield None
+            return
+
+        trace = CheckTrace(label)
+        token = _current_trace.set(trace)
+        started = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            trace.total = time.perf_counter() - started
+            _current_trace.reset(token)
+            self._traces.append(trace)
+
+    def span(self, stage: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        trace = _current_trace.get()
+        if trace is None:
+            return _NULL_SPAN
+        return _Span(trace, stage)
+
+    def add(self, stage: str, seconds: float):
+        trace = _current_trace.get() if self.enabled else None
+        if trace is not None:
+            trace.add(stage, seconds)
+
+    def reset(self):
+        self._traces.clear()
+
+    def stage_percentiles(self) -> Dict[str, Dict[str, float]]:
+        samples: Dict[str, List[float]] = {}
+        for trace in self._traces:
+            samples.setdefault("total", []).append(trace.total)
+            for stage, seconds in trace.stages.items():
+                samples.setdefault(stage, []).append(seconds)
+
+        result = {}
+        for stage, values in samples.items():
+            values.sort()
+            result[stage] = {
+                "count": len(values),
+                "p50": _percentile(values, 0.50),
+                "p95": _percentile(values, 0.95),
+                "p99": _percentile(values, 0.99),
+            }
+        return result
+
+    def slowest(self, limit: int = 5) -> List[CheckTrace]:
+        return sorted(self._traces, key=lambda t: t.total, reverse=True)[:limit]
+
+
+perf = PerfRecorder(config.PERF_ENABLED, config.PERF_WINDOW)
@@ -31,10 +31,15 @@ class ProxyManager:
                 "country": proxy.get("country", "Unknown"),
             }
 
-        logger.info(f"Загружено прокси: {len(self.proxies)}")
+        logger.info("Загружено прокси: %d", len(self.proxies))
         for i, proxy in enumerate(self.proxies, 1):
-            logger.info(
-                f"Прокси {i}: {proxy.get('type')} - {proxy.get('host', 'unknown')}:{proxy.get('port', 'unknown')} - {proxy.get('country', 'Unknown')}"
+            logger.debug(
+                "Прокси %d: %s - %s:%s - %s",
+                i,
+                proxy.get("type"),
+                proxy.get("host", "unknown"),
+                proxy.get("port", "unknown"),
+                proxy.get("country", "Unknown"),
             )
 
     def _parse_proxies(self, proxy_strings: str) -> List[Dict]:
@@ -218,7 +223,7 @@ class ProxyManager:
 
             if self.proxy_stats[proxy_url]["fail_count"] >= 3:
                 self.proxy_stats[proxy_url]["is_active"] = False
-                logger.warning(f"Прокси помечен как неактивный: {proxy_url}")
+                logger.warning("Прокси помечен как неактивный: %s", proxy_url)
 
     async def test_proxy(
         self, proxy: Dict, test_url: str = "https://api.ipify.org?format=json"
@@ -243,8 +248,8 @@ class ProxyManager:
                 async with session.get(test_url) as response:
                     if response.status == 200:
                         data = await response.json()
-                        logger.info(
-                            f"Прокси работает. Ваш IP: {data.get('ip', 'unknown')}"
+                        logger.debug(
+                            "Прокси работает. Ваш IP: %s", data.get("ip", "unknown")
                         )
                         return True
                     else:
@@ -258,6 +263,23 @@ class ProxyManager:
             if connector:
                 await connector.close()
 
+    async def warm_up(self, test_url: str, concurrency: int = 10) -> int:
+        """Параллельно проверяет все прокси при старте и выключает нерабочие,
+        чтобы первая проверка Kwork не тратила попытки на мёртвые прокси.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def check(proxy: Dict) -> bool:
+            async with semaphore:
+                is_working = await self.test_proxy(proxy, test_url)
+            self.proxy_stats[proxy["url"]]["is_active"] = is_working
+            return is_working
+
+        results = await asyncio.gather(*(check(proxy) for proxy in self.proxies))
+        working = sum(results)
+        logger.info("Прогрев прокси: рабочих %d из %d", working, len(self.proxies))
+        return working
+
     def get_stats(self) -> Dict:
         total = len(self.proxies)
         active = sum(1 for stats in self.proxy_stats.values() if stats["is_active"])
@@ -0,0 +1,55 @@
+import random
+import time
+from collections import deque
+from typing import Deque
+
+from config import config
+
+
+class RetryBudget:
+    """Общий на процесс лимит повторных запросов к Kwork.
+
+    За скользящее окно ``window`` секунд повторов разрешается не больше
+    ``ratio`` от числа успешных запросов плюс ``min_retries`` сверху, чтобы
+    единичные сбои при малом трафике всё равно переспрашивались. Когда Kwork
+    деградирует, успехов становится мало и повторы быстро упираются в лимит,
+    вместо того чтобы все проверки разом умножали нагрузку.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 3, window: float = 60):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._successes: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    def _prune(self, now: float):
+        horizon = now - self.window
+        while self._successes and self._successes[0] < horizon:
+            self._successes.popleft()
+        while self._retries and self._retries[0] < horizon:
+            self._retries.popleft()
+
+    def record_success(self):
+        now = time.monotonic()
+        self._prune(now)
+        self._successes.append(now)
+
+    def try_spend(self) -> bool:
+        """Списывает один повтор, если бюджет позволяет"""
+        now = time.monotonic()
+        self._prune(now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._successes):
+            return False
+        self._retries.append(now)
+        return True
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full jitter: случайная пауза от 0 до min(cap, base * 2**attempt)"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+retry_budget = RetryBudget(
+    config.RETRY_BUDGET_RATIO, config.RETRY_BUDGET_MIN, config.RETRY_BUDGET_WINDOW
+)
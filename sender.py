@@ -0,0 +1,208 @@
+import asyncio
+import itertools
+import logging
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from metrics import MESSAGES_SENT, RETRY_AFTER_SECONDS, TELEGRAM_ERRORS
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_ALERT = 0  # уведомления о новых проектах
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2  # служебные и админские сообщения
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated: Optional[float] = None
+
+    def try_acquire(self, now: float) -> float:
+        """Забирает токен; если токена нет, возвращает время ожидания"""
+        if self.updated is not None:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class _SendJob:
+    priority: int
+    seq: int
+    chat_id: int
+    text: str
+    kwargs: Dict[str, Any]
+    future: asyncio.Future
+    retries: int = field(default=0)
+
+    @property
+    def order(self) -> Tuple[int, int]:
+        return self.priority, self.seq
+
+
+class SendScheduler:
+    """Единая очередь отправки с учётом лимитов Telegram.
+
+    Соблюдает глобальный бюджет сообщений в секунду и минимальный интервал
+    между сообщениями в один чат (для групп он больше), отправляет в разные
+    чаты параллельно и откладывает чат ровно на ``retry_after`` при 429.
+    Сообщения с меньшим приоритетом уходят первыми.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = 25,
+        chat_interval: float = 1.0,
+        group_interval: float = 3.0,
+        max_concurrency: int = 16,
+        max_retries: int = 5,
+    ):
+        self.bot = bot
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_retries = max_retries
+
+        self._global = TokenBucket(global_rate)
+        self._max_concurrency = max_concurrency
+        self._jobs: List[_SendJob] = []
+        self._seq = itertools.count()
+        self._chat_ready: Dict[int, float] = {}  # chat_id -> когда можно слать
+        self._busy: Set[int] = set()  # чаты, в которые идёт отправка
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._jobs)
+
+    def start(self):
+        if self._task:
+            return
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._task = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        for job in self._jobs:
+            if not job.future.done():
+                job.future.cancel()
+        self._jobs.clear()
+
+    def submit(
+        self, chat_id: int, text: str, priority: int = PRIORITY_NORMAL, **kwargs
+    ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._jobs.append(
+            _SendJob(priority, next(self._seq), chat_id, text, kwargs, future)
+        )
+        if self._wakeup:
+            self._wakeup.set()
+        return future
+
+    async def send(
+        self, chat_id: int, text: str, priority: int = PRIORITY_NORMAL, **kwargs
+    ):
+        return await self.submit(chat_id, text, priority, **kwargs)
+
+    def _interval_for(self, chat_id: int) -> float:
+        return self.group_interval if chat_id < 0 else self.chat_interval
+
+    def _pick(self, now: float) -> Tuple[Optional[_SendJob], Optional[float]]:
+        best = None
+        next_ready = None
+        for job in self._jobs:
+            if job.chat_id in self._busy:
+                continue
+            ready_at = self._chat_ready.get(job.chat_id, 0.0)
+            if ready_at > now:
+                if next_ready is None or ready_at < next_ready:
+                    next_ready = ready_at
+                continue
+            if best is None or job.order < best.order:
+                best = job
+
+        return best, (next_ready - now if next_ready is not None else None)
+
+    async def _dispatch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            job, wait = self._pick(now)
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            global_wait = self._global.try_acquire(now)
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            await self._semaphore.acquire()
+            self._jobs.remove(job)
+            self._busy.add(job.chat_id)
+            task = asyncio.create_task(self._deliver(job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, job: _SendJob):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await self.bot.send_message(job.chat_id, job.text, **job.kwargs)
+            MESSAGES_SENT.labels(str(job.priority)).inc()
+            if not job.future.done():
+                job.future.set_result(result)
+
+        except TelegramRetryAfter as e:
+            TELEGRAM_ERRORS.labels(type(e).__name__).inc()
+            RETRY_AFTER_SECONDS.observe(e.retry_after)
+            job.retries += 1
+            self._chat_ready[job.chat_id] = loop.time() + e.retry_after
+            logger.warning(
+                "⏳ Flood control для чата %s: ждём %s сек", job.chat_id, e.retry_after
+            )
+            if job.retries > self.max_retries:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self._jobs.append(job)
+
+        except Exception as e:
+            TELEGRAM_ERRORS.labels(type(e).__name__).inc()
+            if not job.future.done():
+                job.future.set_exception(e)
+
+        finally:
+            self._busy.discard(job.chat_id)
+            self._chat_ready[job.chat_id] = max(
+                self._chat_ready.get(job.chat_id, 0.0),
+                loop.time() + self._interval_for(job.chat_id),
+            )
+            self._semaphore.release()
+            self._wakeup.set()
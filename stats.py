@@ -0,0 +1,37 @@
+import math
+from typing import Iterable, List, Optional
+
+# Лог-шкала цен: корзина i покрывает [PRICE_BASE * RATIO^i, PRICE_BASE * RATIO^(i+1)),
+# 40 корзин по 25% дают медиану с точностью ~12% от 100 руб. до ~750 тыс. руб.
+PRICE_BASE = 100.0
+PRICE_RATIO = 1.25
+PRICE_BUCKETS = 40
+
+
+def price_bucket(value: float) -> int:
+    if value <= PRICE_BASE:
+        return 0
+    index = int(math.log(value / PRICE_BASE, PRICE_RATIO))
+    return min(index, PRICE_BUCKETS - 1)
+
+
+def price_histogram(values: Iterable[Optional[float]]) -> List[int]:
+    buckets = [0] * PRICE_BUCKETS
+    for value in values:
+        if value:
+            buckets[price_bucket(float(value))] += 1
+    return buckets
+
+
+def approx_median(buckets: List[int]) -> Optional[float]:
+    """Медиана по гистограмме: середина (геометрическая) нужной корзины"""
+    total = sum(buckets)
+    if not total:
+        return None
+
+    seen = 0
+    for index, count in enumerate(buckets):
+        seen += count
+        if seen * 2 >= total:
+            return PRICE_BASE * PRICE_RATIO ** (index + 0.5)
+    return None
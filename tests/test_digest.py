@@ -0,0 +1,84 @@
+from notifications import (
+    DIGEST_HEADER_RESERVE,
+    DIGEST_MAX_PROJECTS,
+    DIGEST_TITLE_LIMIT,
+    TELEGRAM_MESSAGE_LIMIT,
+    NotificationRenderer,
+    build_digest_messages,
+)
+
+
+def make_project(number: int, title_length: int = 40) -> dict:
+    return {
+        "id": str(number),
+        "title": f"Проект {number} ".ljust(title_length, "x"),
+        "price": "5000 руб.",
+        "url": f"https://kwork.ru/projects/view/{number}",
+    }
+
+
+def test_all_projects_packed_once_and_in_order():
+    projects = [make_project(n) for n in range(37)]
+
+    messages = build_digest_messages(projects)
+
+    indexes = [i for chunk, _, _ in messages for i in chunk]
+    assert indexes == list(range(len(projects)))
+
+
+def test_small_burst_fits_one_message():
+    projects = [make_project(n) for n in range(5)]
+
+    messages = build_digest_messages(projects)
+
+    assert len(messages) == 1
+    _, text, keyboard = messages[0]
+    assert "Новые проекты на Kwork: 5</b>\n" in text
+    buttons = [button for row in keyboard.inline_keyboard for button in row]
+    assert [button.url for button in buttons] == [p["url"] for p in projects]
+
+
+def test_messages_stay_within_telegram_limit():
+    projects = [make_project(n, title_length=200) for n in range(150)]
+
+    messages = build_digest_messages(projects)
+
+    assert len(messages) > 1
+    for _, text, _ in messages:
+        assert len(text) <= TELEGRAM_MESSAGE_LIMIT
+    # Длинные названия обрезаются, иначе в сообщение влезало бы меньше проектов
+    assert "x" * DIGEST_TITLE_LIMIT not in messages[0][1]
+
+
+def test_chunks_are_filled_before_starting_a_new_one():
+    projects = [make_project(n, title_length=200) for n in range(150)]
+
+    messages = build_digest_messages(projects)
+
+    bodies = [text.split("\n\n", 1)[1].split("\n") for _, text, _ in messages]
+    for lines, next_lines in zip(bodies, bodies[1:]):
+        size = DIGEST_HEADER_RESERVE + sum(len(line) + 1 for line in lines)
+        assert (
+            len(lines) == DIGEST_MAX_PROJECTS
+            or size + len(next_lines[0]) + 1 > TELEGRAM_MESSAGE_LIMIT
+        )
+
+
+def test_button_count_is_capped_per_message():
+    projects = [make_project(n, title_length=10) for n in range(120)]
+
+    messages = build_digest_messages(projects)
+
+    assert [len(chunk) for chunk, _, _ in messages] == [50, 50, 20]
+    assert "(51–100)" in messages[1][1]
+
+
+def test_renderer_picks_up_edited_project():
+    renderer = NotificationRenderer()
+    project = make_project(1)
+    assert "Проект 1" in renderer.render(project)
+
+    edited = {**project, "title": "Новое название"}
+
+    assert "Новое название" in renderer.render(edited)
+    assert renderer.render(edited, "compact") != renderer.render(edited)
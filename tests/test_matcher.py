@@ -0,0 +1,111 @@
+from matcher import AhoCorasick, SubscriptionMatcher, SubscriptionRule
+
+
+def make_project(title: str, price=None, username: str = "buyer", number: int = 1):
+    return {
+        "id": str(number),
+        "title": title,
+        "description": "",
+        "price_value": price,
+        "username": username,
+    }
+
+
+def make_matcher(rules) -> SubscriptionMatcher:
+    matcher = SubscriptionMatcher()
+    for chat_id, data in rules.items():
+        matcher.update(chat_id, SubscriptionRule.from_dict(data))
+    return matcher
+
+
+def test_keywords_match_whole_words_only():
+    automaton = AhoCorasick(["бот", "telegram бот", "c++"])
+
+    assert automaton.find("работа с таблицами excel") == set()
+    assert automaton.find("ботаника") == set()
+    assert automaton.find("нужен бот.") == {"бот"}
+    assert automaton.find("бот") == {"бот"}
+    assert automaton.find("сделать telegram бот, срочно") == {"бот", "telegram бот"}
+    assert automaton.find("разработчик c++ нужен") == {"c++"}
+
+
+def test_include_keywords():
+    matcher = make_matcher({1: {"include_keywords": ["бот"]}})
+
+    assert matcher.route(make_project("Нужен бот для магазина"), [1]) == {1}
+    assert matcher.route(make_project("Работа с таблицами Excel"), [1]) == set()
+
+
+def test_exclude_keywords_do_not_misfire_inside_words():
+    matcher = make_matcher({1: {"exclude_keywords": ["бот"]}})
+
+    assert matcher.route(make_project("Работа с таблицами Excel"), [1]) == {1}
+    assert matcher.route(make_project("Написать бот"), [1]) == set()
+
+
+def test_exclude_wins_over_include():
+    matcher = make_matcher(
+        {1: {"include_keywords": ["парсер"], "exclude_keywords": ["avito"]}}
+    )
+
+    assert matcher.route(make_project("Парсер Ozon"), [1]) == {1}
+    assert matcher.route(make_project("Парсер Avito"), [1]) == set()
+
+
+def test_keywords_are_case_insensitive():
+    matcher = make_matcher({1: {"include_keywords": ["Python"]}})
+
+    assert matcher.route(make_project("СКРИПТ НА PYTHON"), [1]) == {1}
+    assert matcher.route(make_project("python-скрипт"), [1]) == {1}
+
+
+def test_price_bounds_are_inclusive():
+    matcher = make_matcher(
+        {
+            1: {"min_price": 1000, "max_price": 5000},
+            2: {"min_price": 3000},
+            3: {},
+        }
+    )
+    chats = [1, 2, 3]
+
+    assert matcher.route(make_project("Лендинг", 999), chats) == {3}
+    assert matcher.route(make_project("Лендинг", 1000), chats) == {1, 3}
+    assert matcher.route(make_project("Лендинг", 3000), chats) == {1, 2, 3}
+    assert matcher.route(make_project("Лендинг", 5000.5), chats) == {2, 3}
+    # Без цены ценовые фильтры не применяются
+    assert matcher.route(make_project("Лендинг"), chats) == {1, 2, 3}
+
+
+def test_price_filter_applies_to_keyword_matches():
+    matcher = make_matcher({1: {"include_keywords": ["бот"], "min_price": 2000}})
+
+    assert matcher.route(make_project("Бот", 1500), [1]) == set()
+    assert matcher.route(make_project("Бот", 2500), [1]) == {1}
+
+
+def test_price_buckets_follow_subscription_changes():
+    matcher = make_matcher({1: {"min_price": 1000}})
+    project = make_project("Лендинг", 1500)
+    assert matcher.route(project, [1]) == {1}
+
+    matcher.update(1, SubscriptionRule.from_dict({"min_price": 2000}))
+    assert matcher.route(project, [1]) == set()
+
+    matcher.remove(1)
+    assert matcher.route(project, [1]) == {1}
+
+
+def test_blocked_users_and_unsubscribed_chats():
+    matcher = make_matcher({1: {"blocked_users": ["Spammer"]}})
+    project = make_project("Лендинг", username="spammer")
+
+    assert matcher.route(project, [1, 2]) == {2}
+
+
+def test_route_many_only_returns_requested_chats():
+    matcher = make_matcher({1: {"include_keywords": ["бот"]}, 2: {}})
+    projects = [make_project("Бот", number=1), make_project("Сайт", number=2)]
+
+    assert matcher.route_many(projects, [1]) == {"1": {1}, "2": set()}
+    assert matcher.route_many(projects, [1, 2]) == {"1": {1, 2}, "2": {2}}
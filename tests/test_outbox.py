@@ -0,0 +1,86 @@
+import asyncio
+from typing import Dict, List
+
+import outbox
+from outbox import OutboxWorker
+
+
+class FakeOutboxDb:
+    def __init__(self, entries: List[Dict]):
+        self.entries = entries
+        self.completed: List[int] = []
+
+    def lease_outbox(self, max_chats: int, lease_seconds: int) -> List[Dict]:
+        entries, self.entries = self.entries, []
+        return entries
+
+    def extend_outbox_lease(self, entry_ids, lease_token, lease_seconds):
+        return set(entry_ids)
+
+    def complete_outbox(self, entry_ids, lease_token):
+        self.completed.extend(entry_ids)
+        return []
+
+    def fail_outbox(self, entry_id, lease_token, error, retry_in=None):
+        raise AssertionError(f"неожиданная ошибка отправки: {error}")
+
+
+def make_entries(rows) -> List[Dict]:
+    """rows: (chat_id, kind) в порядке id, как их пишет claim_deliveries"""
+    return [
+        {
+            "id": entry_id,
+            "chat_id": chat_id,
+            "project_id": str(entry_id),
+            "kind": kind,
+            "payload": {"id": str(entry_id)},
+            "attempts": 1,
+            "lease_token": "token",
+        }
+        for entry_id, (chat_id, kind) in enumerate(rows, 1)
+    ]
+
+
+def run_drain(monkeypatch, entries: List[Dict], threshold: int = 5):
+    fake_db = FakeOutboxDb(entries)
+    monkeypatch.setattr(outbox, "db", fake_db)
+    single: List[Dict] = []
+    digests: Dict[int, List[List[int]]] = {}
+
+    async def deliver(entry):
+        single.append(entry)
+
+    async def deliver_digest(chat_id, chat_entries):
+        digests.setdefault(chat_id, []).append([e["id"] for e in chat_entries])
+        yield chat_entries
+
+    worker = OutboxWorker(
+        deliver, deliver_digest=deliver_digest, digest_threshold=threshold
+    )
+    asyncio.run(worker.drain_once())
+    return fake_db, single, digests
+
+
+def test_burst_goes_out_as_one_digest_per_chat(monkeypatch):
+    # Fan-out проект за проектом: записи чатов идут вперемешку
+    rows = [(chat_id, "new") for _ in range(6) for chat_id in (101, 102, 103)]
+
+    fake_db, single, digests = run_drain(monkeypatch, make_entries(rows))
+
+    assert single == []
+    assert sorted(digests) == [101, 102, 103]
+    for chat_id, batches in digests.items():
+        assert len(batches) == 1
+        assert len(batches[0]) == 6
+    assert sorted(fake_db.completed) == list(range(1, len(rows) + 1))
+
+
+def test_below_threshold_and_updates_are_sent_individually(monkeypatch):
+    rows = [(101, "new")] * 4 + [(102, "new")] * 5 + [(102, "update")]
+
+    fake_db, single, digests = run_drain(monkeypatch, make_entries(rows))
+
+    assert list(digests) == [102]
+    assert digests[102] == [[5, 6, 7, 8, 9]]
+    assert sorted(entry["id"] for entry in single) == [1, 2, 3, 4, 10]
+    assert sorted(fake_db.completed) == list(range(1, 11))
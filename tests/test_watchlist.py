@@ -0,0 +1,82 @@
+import asyncio
+from typing import Dict, List
+
+import watchlist
+from watchlist import WatchlistWorker
+
+
+class FakeWatchDb:
+    def __init__(self, entries: List[Dict]):
+        self.entries = entries
+        self.saved: List[str] = []
+        self.dropped: List[str] = []
+
+    def drop_watches(self, project_ids=(), max_age_days=None):
+        self.dropped.extend(project_ids)
+        return 0
+
+    def lease_watches(self, batch_size, lease_seconds):
+        entries, self.entries = self.entries, []
+        return entries
+
+    def save_watch_poll(self, project_id, *args):
+        self.saved.append(project_id)
+
+
+class FakeParser:
+    def __init__(self, responses: Dict[str, object]):
+        self.responses = responses
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    async def fetch_conditional(self, url, etag=None, last_modified=None):
+        response = self.responses[url]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    @staticmethod
+    def parse_project_state(html):
+        return {"status": html}
+
+
+def make_entry(project_id: str) -> Dict:
+    return {
+        "project_id": project_id,
+        "url": project_id,
+        "title": project_id,
+        "status": "active",
+        "offers": None,
+        "etag": None,
+        "last_modified": None,
+        "expires_at": None,
+        "chat_ids": [1],
+    }
+
+
+def test_failing_entry_does_not_abort_the_batch(monkeypatch):
+    fake_db = FakeWatchDb([make_entry("slow"), make_entry("ok"), make_entry("gone")])
+    monkeypatch.setattr(watchlist, "db", fake_db)
+    parser = FakeParser(
+        {
+            "slow": RuntimeError("boom"),
+            "ok": (304, None, None, None),
+            "gone": (200, "closed", None, None),
+        }
+    )
+    notified = []
+
+    async def notify(chat_id, entry, state):
+        notified.append(entry["project_id"])
+
+    polled = asyncio.run(WatchlistWorker(lambda: parser, notify).poll_once())
+
+    assert polled == 3
+    assert sorted(fake_db.saved) == ["gone", "ok"]
+    assert fake_db.dropped == ["gone"]
+    assert notified == ["gone"]
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Tuple
+
+from config import config
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+class UserDirectory:
+    """Кэш ролей пользователей и отложенная пакетная запись профилей.
+
+    Проверка прав не ходит в БД чаще, чем раз в ``ttl`` секунд на
+    пользователя, а профили копятся в памяти и сбрасываются одним
+    upsert'ом в ``flush``. Явная инвалидация не нужна: users.is_admin
+    всегда выводится из ADMIN_IDS, которые меняются только с перезапуском.
+    """
+
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+        self._roles: Dict[int, Tuple[bool, float]] = {}  # user_id -> (is_admin, expires)
+        self._pending: Dict[int, Dict] = {}  # user_id -> профиль для upsert
+
+    def touch(self, user) -> None:
+        if user is None or user.is_bot:
+            return
+        self._pending[user.id] = {
+            "user_id": user.id,
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+        }
+
+    async def is_admin(self, user_id: int) -> bool:
+        if user_id in config.ADMIN_IDS:
+            return True
+
+        cached = self._roles.get(user_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        try:
+            is_admin = await asyncio.to_thread(db.is_user_admin, user_id)
+        except Exception as e:
+            logger.error(f"❌ Ошибка проверки роли пользователя {user_id}: {e}")
+            return False
+
+        self._roles[user_id] = (is_admin, time.monotonic() + self.ttl)
+        return is_admin
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(db.upsert_users, list(batch.values()))
+        except Exception:
+            # Возвращаем неотправленные профили, не затирая более свежие
+            for user_id, profile in batch.items():
+                self._pending.setdefault(user_id, profile)
+            raise
+
+        logger.debug("Сохранено профилей пользователей: %d", len(batch))
+        return len(batch)
+
+
+users = UserDirectory(config.USER_CACHE_TTL)
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from database import db
+from parser import KworkParser
+
+logger = logging.getLogger(__name__)
+
+# Статусы, после которых следить за проектом бессмысленно
+CLOSED_STATUSES = {"deleted", "closed", "archived", "cancel", "stop"}
+
+
+class WatchlistWorker:
+    """Повторный опрос отслеживаемых проектов.
+
+    За один проход берётся пачка проектов, у которых подошло время опроса;
+    запросы идут параллельно, но не больше ``concurrency`` одновременно, и
+    с If-None-Match/If-Modified-Since, так что неизменившаяся страница
+    стоит ответа 304 без тела. Следующий опрос назначается через долю
+    ``time_fraction`` от оставшегося времени приёма заявок, в пределах
+    [min_interval, max_interval]: чем ближе дедлайн, тем чаще опрос.
+    """
+
+    def __init__(
+        self,
+        make_parser: Callable[[], KworkParser],
+        notify: Callable[[int, Dict[str, Any], Dict[str, Any]], Awaitable[None]],
+        concurrency: int = 4,
+        batch_size: int = 50,
+        poll_interval: float = 30,
+        min_interval: float = 120,
+        max_interval: float = 3600,
+        time_fraction: float = 0.1,
+        max_age_days: int = 14,
+    ):
+        self.make_parser = make_parser
+        self.notify = notify
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.time_fraction = time_fraction
+        self.max_age_days = max_age_days
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                polled = await self.poll_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка опроса отслеживаемых проектов: {e}")
+                polled = 0
+
+            if polled < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def next_interval(self, expires_at: Optional[float]) -> float:
+        if not expires_at:
+            return self.max_interval
+        time_left = max(0.0, expires_at - time.time())
+        interval = time_left * self.time_fraction
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    async def poll_once(self) -> int:
+        dropped = await asyncio.to_thread(
+            db.drop_watches, max_age_days=self.max_age_days
+        )
+        if dropped:
+            logger.info("👁 Убрано из отслеживания истёкших проектов: %d", dropped)
+
+        entries = await asyncio.to_thread(
+            db.lease_watches, self.batch_size, int(self.max_interval)
+        )
+        if not entries:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        closed: List[str] = []
+        async with self.make_parser() as parser:
+            await asyncio.gather(
+                *(self._poll(parser, semaphore, entry, closed) for entry in entries)
+            )
+
+        if closed:
+            await asyncio.to_thread(db.drop_watches, closed)
+        return len(entries)
+
+    async def _poll(
+        self,
+        parser: KworkParser,
+        semaphore: asyncio.Semaphore,
+        entry: Dict[str, Any],
+        closed: List[str],
+    ):
+        try:
+            await self._poll_entry(parser, semaphore, entry, closed)
+        except Exception as e:
+            # Ошибка одного проекта не должна обрывать всю пачку в gather
+            logger.error(
+                "❌ Ошибка опроса отслеживаемого проекта %s: %s", entry["project_id"], e
+            )
+
+    async def _poll_entry(
+        self,
+        parser: KworkParser,
+        semaphore: asyncio.Semaphore,
+        entry: Dict[str, Any],
+        closed: List[str],
+    ):
+        async with semaphore:
+            status, html, etag, last_modified = await parser.fetch_conditional(
+                entry["url"], entry["etag"], entry["last_modified"]
+            )
+
+        state: Dict[str, Any] = {}
+        if status == 200 and html:
+            state = parser.parse_project_state(html)
+        elif status == 404:
+            state = {"status": "deleted"}
+
+        await asyncio.to_thread(
+            db.save_watch_poll,
+            entry["project_id"],
+            state.get("status"),
+            state.get("offers"),
+            etag,
+            last_modified,
+            self.next_interval(entry["expires_at"]),
+        )
+
+        new_status = state.get("status")
+        if not new_status or new_status == entry["status"]:
+            return
+        if new_status in CLOSED_STATUSES:
+            closed.append(entry["project_id"])
+        # Первый успешный опрос только запоминает статус
+        if entry["status"] is None and new_status not in CLOSED_STATUSES:
+            return
+
+        for chat_id in entry["chat_ids"]:
+            try:
+                await self.notify(chat_id, entry, state)
+            except Exception as e:
+                logger.error(
+                    "❌ Ошибка уведомления об изменении статуса %s в чат %s: %s",
+                    entry["project_id"],
+                    chat_id,
+                    e,
+                )
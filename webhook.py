@@ -0,0 +1,104 @@
+import asyncio
+import hmac
+import logging
+from contextlib import suppress
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher, types
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Приём апдейтов Telegram через встроенный aiohttp-сервер.
+
+    Запрос проверяется по секретному токену и сразу подтверждается, а сам
+    апдейт уходит в очередь, которую разбирают ``workers`` обработчиков.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret: str = "",
+        workers: int = 4,
+        queue_size: int = 1000,
+    ):
+        if not secret:
+            # Без секрета публичный порт принял бы любой поддельный апдейт
+            raise ValueError("Для webhook нужен секретный токен (WEBHOOK_SECRET)")
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self.workers = workers
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle)
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._worker_tasks: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret
+        ):
+            return web.Response(status=401)
+
+        try:
+            update = types.Update.model_validate(
+                await request.json(), context={"bot": self.bot}
+            )
+        except Exception as e:
+            logger.warning(f"Некорректный апдейт во webhook: {e}")
+            return web.Response(status=400)
+
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Telegram повторит доставку позже
+            return web.Response(status=503)
+
+        return web.Response()
+
+    async def _worker(self):
+        while True:
+            update = await self._queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки апдейта {update.update_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def start(self, host: str, port: int):
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(
+            f"🌐 Webhook-сервер слушает {host}:{port}{self.path} "
+            f"(обработчиков: {self.workers})"
+        )
+
+    async def join(self):
+        await self._queue.join()
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+        for task in self._worker_tasks:
+            task.cancel()
+        for task in self._worker_tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._worker_tasks = []